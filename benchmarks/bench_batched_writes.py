@@ -0,0 +1,50 @@
+"""
+Participation burst against the database: every simulated tap runs
+create_user + add_participant, like the participate handler does.
+
+    python -m benchmarks.bench_batched_writes [taps]
+
+Reports inserts/sec with the write-behind batch switched off and on.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from bot.database.core import Database
+
+async def run(taps: int, batch_writes: bool) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"), batch_writes=batch_writes)
+        await db.open()
+        await db.migrate()
+        giveaway_id = await db.create_giveaway("bench", "-1001", None, None, "Участвую", -1002)
+
+        async def tap(user_id):
+            await db.create_user(user_id, f"user{user_id}", f"User {user_id}")
+            return await db.add_participant(user_id, giveaway_id)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(tap(user_id) for user_id in range(1, taps + 1)))
+        # Second press by everyone must report "already participating"
+        repeats = await asyncio.gather(*(tap(user_id) for user_id in range(1, taps + 1)))
+        elapsed = time.perf_counter() - started
+
+        assert all(results) and not any(repeats)
+        assert await db.get_participants_count(giveaway_id) == taps
+        await db.close()
+
+    # Each tap is two writes (user upsert + participant insert)
+    return taps * 2 * 2 / elapsed
+
+async def main():
+    taps = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    unbatched = await run(taps, batch_writes=False)
+    batched = await run(taps, batch_writes=True)
+    print(f"taps: {taps}")
+    print(f"without batching: {unbatched:10.0f} inserts/sec")
+    print(f"with batching:    {batched:10.0f} inserts/sec ({batched / unbatched:.1f}x)")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+"""
+Random winner draw on large giveaways.
+
+    python -m benchmarks.bench_draw [winners]
+
+For 10k, 100k and 1M participants compares the old approach (load every
+participant, shuffle, check one by one, one winner per press) with
+bot.draw.draw_winners. Subscription checks go to a fake bot that answers
+after a short delay and says "left" for ~20% of users.
+"""
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+from bot import draw
+from bot import utils
+from bot.database.core import Database
+from bot.database.giveaways import parse_channel_ids
+
+API_LATENCY = 0.02
+
+class FakeBot:
+    def __init__(self):
+        self.calls = 0
+
+    async def get_chat_member(self, chat_id, user_id):
+        self.calls += 1
+        await asyncio.sleep(API_LATENCY)
+        return SimpleNamespace(status="left" if user_id % 5 == 0 else "member")
+
+def populate(path, participants):
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO users (id, username, full_name) VALUES (?, ?, ?)",
+                     ((i, f"user{i}", f"User {i}") for i in range(1, participants + 1)))
+    conn.executemany("INSERT INTO participants (user_id, giveaway_id) VALUES (?, 1)",
+                     ((i,) for i in range(1, participants + 1)))
+    conn.commit()
+    conn.close()
+
+async def legacy_pick(db, bot, gw, channels):
+    # What pick_random_winner did before, for one winner
+    participants = await db.get_participants(gw['id'])
+    winner_ids = [w['id'] for w in await db.get_winners(gw['id'])]
+    random.shuffle(participants)
+    for p in participants:
+        if p['id'] in winner_ids:
+            continue
+        is_sub = True
+        for ch in channels:
+            if not await utils.check_subscription(bot, p['id'], ch):
+                is_sub = False
+                break
+        if is_sub:
+            await db.set_winner(p['id'], gw['id'])
+            return p
+
+async def run(participants, k):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        await db.open()
+        await db.migrate()
+        await db.create_giveaway("bench", "-1001,-1002", None, None, "Участвую", -1003)
+        await asyncio.to_thread(populate, db.db_path, participants)
+        # The draw and the membership lookups in utils both use the module db
+        draw.db = utils.db = db
+        gw = await db.get_giveaway(1)
+        channels = parse_channel_ids(gw['channel_ids'])
+
+        utils.subscription_cache.clear()
+        bot = FakeBot()
+        started = time.perf_counter()
+        for _ in range(k):
+            await legacy_pick(db, bot, gw, channels)
+        legacy = time.perf_counter() - started
+        legacy_calls = bot.calls
+
+        async with db.writer() as conn:
+            await conn.execute("UPDATE participants SET is_winner = 0")
+            await conn.commit()
+
+        utils.subscription_cache.clear()
+        bot = FakeBot()
+        started = time.perf_counter()
+        winners = await draw.draw_winners(bot, gw, k)
+        engine = time.perf_counter() - started
+        assert len(winners) == k
+
+        await db.close()
+    print(f"{participants:>9} | {legacy:8.3f}s {legacy_calls:5} calls | {engine:8.3f}s {bot.calls:5} calls | {legacy / engine:6.1f}x")
+
+async def main():
+    k = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    print(f"winners: {k}, API latency: {API_LATENCY * 1000:.0f} ms")
+    print(f"{'entrants':>9} | {'old, k presses':>22} | {'draw_winners':>22} |")
+    for participants in (10_000, 100_000, 1_000_000):
+        await run(participants, k)
+
+if __name__ == "__main__":
+    asyncio.run(main())
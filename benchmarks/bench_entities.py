@@ -0,0 +1,102 @@
+"""
+Rendering message entities to HTML.
+
+    python -m benchmarks.bench_entities [entities ...]
+
+Builds 4096-character captions (Cyrillic, emoji, characters that need
+escaping) with a few hundred entities, half of them nested, and times:
+
+  legacy    the old renderer: += per entity, no nesting, Python indexes
+            instead of UTF-16 offsets, so its output is wrong past an emoji
+  aiogram   html_decoration.unparse, recursive, handles nesting
+  stack     bot.utils.get_message_html
+"""
+import random
+import sys
+import timeit
+
+from aiogram.types import Message, MessageEntity
+from aiogram.utils.text_decorations import html_decoration
+
+from bot.utils import get_message_html
+
+CAPTION_LENGTH = 4096
+WORDS = ["Розыгрыш", "приз", "🎁", "подпишись", "канал", "😀", "итоги", "<b>", "&", "участвуй"]
+TYPES = ["bold", "italic", "underline", "strikethrough", "spoiler", "code"]
+
+def utf16_len(text):
+    return len(text.encode("utf-16-le")) // 2
+
+def build_caption(count):
+    rng = random.Random(1)
+    words = []
+    length = 0
+    while True:
+        word = rng.choice(WORDS)
+        if length + len(word) + 1 > CAPTION_LENGTH:
+            break
+        words.append(word)
+        length += len(word) + 1
+    text = " ".join(words)
+
+    # Word boundaries in UTF-16 units; every other entity gets one nested inside
+    bounds = []
+    offset = 0
+    for word in words:
+        bounds.append((offset, utf16_len(word)))
+        offset += utf16_len(word) + 1
+    entities = []
+    step = max(len(bounds) // count, 2)
+    for i in range(0, len(bounds) - 1, step):
+        if len(entities) >= count:
+            break
+        start, length = bounds[i]
+        next_start, next_length = bounds[i + 1]
+        entities.append(MessageEntity(type=rng.choice(TYPES[:5]), offset=start, length=next_start + next_length - start))
+        if i % 2 == 0:
+            entities.append(MessageEntity(type="italic", offset=next_start, length=next_length))
+    entities.append(MessageEntity(type="text_link", offset=0, length=bounds[0][1], url="https://t.me/c?a=1&b=2"))
+    return Message.model_construct(text=None, entities=None, caption=text, caption_entities=entities)
+
+def legacy_html(message):
+    # What get_message_html did before: string slicing by Python index, +=
+    text = message.text or message.caption
+    entities = sorted(message.entities or message.caption_entities, key=lambda e: e.offset)
+    formatted_text = ""
+    last_offset = 0
+    tags = {"bold": "b", "italic": "i", "code": "code", "pre": "pre", "strikethrough": "s", "underline": "u"}
+    for entity in entities:
+        start = entity.offset
+        end = start + entity.length
+        formatted_text += html_decoration.quote(text[last_offset:start])
+        entity_text = text[start:end]
+        if entity.type == "text_link":
+            formatted_text += f'<a href="{entity.url}">{html_decoration.quote(entity_text)}</a>'
+        elif entity.type in tags:
+            tag = tags[entity.type]
+            formatted_text += f'<{tag}>{html_decoration.quote(entity_text)}</{tag}>'
+        else:
+            formatted_text += html_decoration.quote(entity_text)
+        last_offset = end
+    formatted_text += html_decoration.quote(text[last_offset:])
+    return formatted_text
+
+def timed(render, message):
+    number, total = timeit.Timer(lambda: render(message)).autorange()
+    return 1e6 * total / number
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [100, 300, 600]
+    aiogram_html = lambda message: html_decoration.unparse(message.caption, message.caption_entities)
+    print(f"{'entities':>8} {'units':>6} {'legacy us':>10} {'aiogram us':>11} {'stack us':>9}")
+    for count in counts:
+        message = build_caption(count)
+        print(f"{len(message.caption_entities):>8} {utf16_len(message.caption):>6} {timed(legacy_html, message):>10.0f} "
+              f"{timed(aiogram_html, message):>11.0f} {timed(get_message_html, message):>9.0f}")
+
+    # Same markup as aiogram, apart from attribute values that it leaves unescaped
+    message = build_caption(counts[-1])
+    assert get_message_html(message) == aiogram_html(message).replace("&b=", "&amp;b=")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Event loop lag during a participation storm, by logging setup.
+
+    python -m benchmarks.bench_logging [users]
+
+Runs the storm scenario of benchmarks.load_test once per setup and samples
+how late a 5 ms timer fires on the loop. The console is simulated: every
+write blocks for CONSOLE_WRITE_DELAY, like a terminal or a log pipe that
+can't keep up.
+
+Every run starts from the same state: the subscription cache and the
+channel_members table are emptied, so each run makes the same Bot API
+calls. An unreported warm-up run goes first. The "lines" column shows how
+much each setup actually wrote.
+
+  sync      every record written from the loop, as print() did
+  queue     bot.logs pipeline at DEBUG, the listener thread writes
+  sampled   same with 10% of per-tap debug events kept
+  info      bot.logs pipeline at the default level
+"""
+import asyncio
+import logging
+import sys
+import time
+
+from benchmarks.fake_bot_api import FakeBotAPI
+from benchmarks.load_test import FAKE_API_PORT, LoadTest, percentile
+from bot.database.core import db
+from bot.logs import TextFormatter, setup_logging, stop_logging
+from bot.ratelimit import api_scheduler
+from bot.utils import subscription_cache
+
+CONSOLE_WRITE_DELAY = 0.0002
+TICK = 0.005
+
+class SlowConsole:
+    def __init__(self):
+        self.lines = 0
+
+    def write(self, text):
+        self.lines += text.count("\n")
+        time.sleep(CONSOLE_WRITE_DELAY)
+
+    def flush(self):
+        pass
+
+def sync_logging(console):
+    handler = logging.StreamHandler(console)
+    handler.setFormatter(TextFormatter())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(logging.INFO)
+    logging.getLogger("bot").setLevel(logging.DEBUG)
+
+async def measure_lag(lags):
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - started - TICK)
+
+async def reset_memberships():
+    # Batched behind the membership writes still queued, so it runs after them
+    await db._enqueue("DELETE FROM channel_members", ())
+    subscription_cache.clear()
+
+async def run(label, configure, users, test, report=True):
+    await reset_memberships()
+    console = SlowConsole()
+    configure(console)
+    test.latencies.clear()
+
+    giveaway_id = await db.create_giveaway("Bench", "-1001000000001,-1001000000002", None, None, "Участвую", None)
+
+    lags = []
+    monitor = asyncio.create_task(measure_lag(lags))
+    started = time.perf_counter()
+    for user_id in range(2, users + 2):
+        test.tap(user_id, f"participate_{giveaway_id}")
+    await test.drain()
+    elapsed = time.perf_counter() - started
+    monitor.cancel()
+
+    stop_logging()
+    logging.getLogger().handlers[:] = []
+
+    if not report:
+        return
+    ms = [1000 * x for x in lags]
+    taps = [1000 * x for x in test.latencies]
+    print(f"{label:<8} {percentile(ms, 0.50):>8.2f} {percentile(ms, 0.99):>8.2f} {max(ms):>8.2f} "
+          f"{percentile(taps, 0.95):>10.1f} {users / elapsed:>8.0f} {console.lines:>8}")
+
+async def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    api = FakeBotAPI(latency=0.02, jitter=0.01)
+    await api.start(port=FAKE_API_PORT)
+    for attr in ("global_rate", "other_rate", "chat_rate", "chat_burst", "private_rate", "private_burst"):
+        setattr(api_scheduler, attr, 1e9)
+
+    print(f"taps: {users}, console write: {CONSOLE_WRITE_DELAY * 1e6:.0f} us, timer: {TICK * 1000:.0f} ms")
+    print(f"{'logging':<8} {'lag p50':>8} {'lag p99':>8} {'lag max':>8} {'tap p95':>10} {'taps/s':>8} {'lines':>8}")
+    test = LoadTest(api, "feed", concurrency=100)
+    await test.start()
+    try:
+        await run("warm-up", lambda console: setup_logging("WARNING", stream=console), users, test, report=False)
+        await run("sync", sync_logging, users, test)
+        await run("queue", lambda console: setup_logging("DEBUG", stream=console), users, test)
+        await run("sampled", lambda console: setup_logging("DEBUG", sample_rate=0.1, stream=console), users, test)
+        await run("info", lambda console: setup_logging("INFO", stream=console), users, test)
+    finally:
+        await test.stop()
+        await api.stop()
+
+if __name__ == "__main__":
+    asyncio.run(main())
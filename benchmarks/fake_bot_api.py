@@ -0,0 +1,182 @@
+"""
+Local stand-in for the Telegram Bot API, for end-to-end runs and load
+tests without touching Telegram. Point the bot at it with TELEGRAM_API_URL.
+
+Only the methods the bot uses are implemented; every call is recorded
+in `calls` (method -> count) and `requests` (method, params).
+Each call can be delayed by `latency` (+ random `jitter`) seconds and fail
+with a 500 (`error_rate`) or a 429 flood wait (`flood_rate`). Updates put
+into push_update() are served by getUpdates.
+"""
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter
+
+from aiohttp import web
+
+BOT_ID = 1000
+
+class FakeBotAPI:
+    def __init__(self, member_status: str = "member", latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, flood_rate: float = 0.0, retry_after: int = 1):
+        self.member_status = member_status
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.calls = Counter()
+        # Calls per bot id (the token prefix), for several bots on one API
+        self.bot_calls = Counter()
+        self.errors = Counter()
+        self.requests = []
+        self.updates = asyncio.Queue()
+        self._message_ids = itertools.count(1)
+        self._runner = None
+
+    def push_update(self, update: dict):
+        self.updates.put_nowait(update)
+
+    def reset_stats(self):
+        self.calls.clear()
+        self.bot_calls.clear()
+        self.errors.clear()
+        self.requests.clear()
+
+    def app(self) -> web.Application:
+        # Documents are uploaded in the request body
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_route("*", "/bot{token}/{method}", self.handle)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8081):
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def wait_for(self, method: str, count: int = 1, timeout: float = 5.0):
+        deadline = time.monotonic() + timeout
+        while self.calls[method] < count:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{method} called {self.calls[method]} times, expected {count}")
+            await asyncio.sleep(0.01)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = dict(await request.post())
+        self.calls[method] += 1
+        self.bot_calls[int(request.match_info["token"].split(":")[0])] += 1
+        self.requests.append((method, params))
+
+        if method == "getUpdates":
+            return web.json_response({"ok": True, "result": await self._get_updates(params)})
+
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+
+        roll = random.random()
+        if roll < self.flood_rate:
+            self.errors[method] += 1
+            return web.json_response({
+                "ok": False, "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            })
+        if roll < self.flood_rate + self.error_rate:
+            self.errors[method] += 1
+            return web.json_response({"ok": False, "error_code": 500, "description": "Internal Server Error"}, status=500)
+
+        handler = getattr(self, f"api_{method}", None)
+        if handler is None:
+            return web.json_response({"ok": False, "error_code": 404, "description": f"Not Found: method {method}"})
+        return web.json_response({"ok": True, "result": handler(params)})
+
+    async def _get_updates(self, params):
+        # Long polling: wait up to `timeout` seconds for the first update
+        timeout = float(params.get("timeout") or 0)
+        updates = []
+        try:
+            updates.append(await asyncio.wait_for(self.updates.get(), timeout) if timeout else self.updates.get_nowait())
+        except (asyncio.TimeoutError, asyncio.QueueEmpty):
+            return []
+        limit = int(params.get("limit") or 100)
+        while len(updates) < limit and not self.updates.empty():
+            updates.append(self.updates.get_nowait())
+        return updates
+
+    # --- methods ---
+
+    def api_getMe(self, params):
+        return {"id": BOT_ID, "is_bot": True, "first_name": "Fake", "username": "fake_giveaway_bot"}
+
+    def api_setWebhook(self, params):
+        return True
+
+    def api_deleteWebhook(self, params):
+        return True
+
+    def api_answerCallbackQuery(self, params):
+        return True
+
+    def api_deleteMessage(self, params):
+        return True
+
+    def api_getChatMember(self, params):
+        user = {"id": int(params["user_id"]), "is_bot": False, "first_name": "User"}
+        # member_status may also be a function of (user_id, chat_id)
+        status = self.member_status
+        if callable(status):
+            status = status(user["id"], params["chat_id"])
+        if status in ("administrator", "creator"):
+            return {"status": status, "user": user, "can_be_edited": False, "is_anonymous": False,
+                    "can_manage_chat": True, "can_delete_messages": True, "can_manage_video_chats": True,
+                    "can_restrict_members": True, "can_promote_members": True, "can_change_info": True,
+                    "can_invite_users": True, "can_post_stories": True, "can_edit_stories": True,
+                    "can_delete_stories": True, "can_send_welcome_messages": True}
+        return {"status": status, "user": user}
+
+    def api_getChat(self, params):
+        chat_id = params["chat_id"]
+        chat_id = int(chat_id) if chat_id.lstrip("-").isdigit() else -1000000000000 - len(chat_id)
+        return {"id": chat_id, "type": "channel", "title": f"Channel {chat_id}", "username": f"channel{abs(chat_id)}",
+                "accent_color_id": 0, "max_reaction_count": 11,
+                "accepted_gift_types": {"unlimited_gifts": False, "limited_gifts": False,
+                                        "unique_gifts": False, "premium_subscription": False,
+                                        "gifts_from_channels": False}}
+
+    def _message(self, params, **extra):
+        chat_id = int(params["chat_id"])
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "channel"},
+        }
+        # Sent messages only carry inline keyboards, reply keyboards are not echoed
+        markup = json.loads(params["reply_markup"]) if "reply_markup" in params else None
+        if markup and "inline_keyboard" in markup:
+            message["reply_markup"] = markup
+        message.update(extra)
+        return message
+
+    def api_sendMessage(self, params):
+        return self._message(params, text=params.get("text", ""))
+
+    def api_editMessageText(self, params):
+        return self._message(params, text=params.get("text", ""))
+
+    def api_sendDocument(self, params):
+        document = params["document"]
+        size = len(document.file.read()) if hasattr(document, "file") else 0
+        return self._message(params, document={"file_id": f"doc{size}", "file_unique_id": f"doc{size}",
+                                               "file_name": getattr(document, "filename", None), "file_size": size})
+
+    def api_editMessageReplyMarkup(self, params):
+        return self._message(params, message_id=int(params["message_id"]))
@@ -0,0 +1,307 @@
+"""
+Load test of the whole bot against the fake Bot API.
+
+    python -m benchmarks.load_test [--users 1000] [--latency 0.05] [--error-rate 0.01] ...
+
+Starts benchmarks.fake_bot_api and runs the real Dispatcher and routers
+from bot.main on a fresh database. Three scenarios are driven through it:
+
+  storm    every user taps participate_<id>, some of them several times
+  admin    the admin opens the participant list, pages through it, picks
+           winners by hand and at random and publishes the results
+  results  users open /start res_<id> from the results post
+
+Updates go straight into Dispatcher.feed_update (--mode feed, default) or
+through getUpdates long polling (--mode polling). For every scenario it
+prints p50/p95/p99 handler latency (from handing the update over until its
+handler is done), DB ops/sec and Bot API calls per update.
+
+Telegram's rate limits are switched off unless --rate-limits is given, so
+the numbers show the bot's own overhead rather than the flood limits. Run
+it with them too, as in production:
+
+    python -m benchmarks.load_test --users 300 --rate-limits
+
+Taps answered with "Telegram is slow" instead of a subscription check are
+counted, and the run exits with status 1 if there were any.
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+FAKE_API_PORT = 18091
+METRICS_PORT = 18092
+ADMIN_ID = 1
+# Start of the answer a tap gets when the subscription check ran out of time
+LATE_ANSWER = "⏳ Telegram долго отвечает"
+
+tmp = tempfile.TemporaryDirectory()
+os.environ.update({
+    "BOT_TOKEN": "1000:fake-token",
+    "ADMIN_IDS": str(ADMIN_ID),
+    "DB_PATH": os.path.join(tmp.name, "bot.db"),
+    "WEBHOOK_URL": "",
+    "TELEGRAM_API_URL": f"http://127.0.0.1:{FAKE_API_PORT}",
+    # Left on as in production, the numbers include its overhead
+    "METRICS_PORT": str(METRICS_PORT),
+})
+
+from aiogram.types import Update
+
+from benchmarks.fake_bot_api import FakeBotAPI
+from bot.database.core import db
+from bot.main import create_bot, create_dispatcher
+from bot.ratelimit import api_scheduler
+
+# Database methods that are not queries
+NOT_DB_OPS = {"open", "close", "migrate", "writer", "reader", "add_listener"}
+
+def count_db_ops(database, counter: Counter):
+    """
+    Wraps every public query method of `database` so calls are counted.
+    """
+    def wrap(name, method):
+        async def counted(*args, **kwargs):
+            counter[name] += 1
+            return await method(*args, **kwargs)
+        return counted
+
+    for name, method in inspect.getmembers(database, inspect.iscoroutinefunction):
+        if not name.startswith("_") and name not in NOT_DB_OPS:
+            setattr(database, name, wrap(name, method))
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def user(user_id):
+    return {"id": user_id, "is_bot": False, "first_name": f"User {user_id}", "username": f"user{user_id}"}
+
+def private_message(user_id, message_id, text):
+    message = {
+        "message_id": message_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": user(user_id),
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return message
+
+class LoadTest:
+    def __init__(self, api: FakeBotAPI, mode: str, concurrency: int):
+        self.api = api
+        self.mode = mode
+        self.bot = create_bot()
+        self.dp = create_dispatcher()
+        self.dp.update.outer_middleware(self._measure)
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+        self.db_ops = Counter()
+        count_db_ops(db, self.db_ops)
+
+        self._update_ids = iter(range(1, 10 ** 9))
+        self._submitted = {}  # update_id -> perf_counter() when handed over
+        self._pending = set()
+        self._done = asyncio.Event()
+        self._tasks = set()
+        self._polling_task = None
+        self.latencies = []
+        self.errors = Counter()
+        self.late_answers = 0
+
+    async def _measure(self, handler, event, data):
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            self.errors[type(e).__name__] += 1
+        finally:
+            started = self._submitted.pop(event.update_id, None)
+            if started is not None:
+                self.latencies.append(time.perf_counter() - started)
+                self._pending.discard(event.update_id)
+                if not self._pending:
+                    self._done.set()
+
+    async def start(self):
+        if self.mode == "polling":
+            self._polling_task = asyncio.create_task(self.dp.start_polling(
+                self.bot, polling_timeout=1, handle_signals=False, close_bot_session=False))
+            while not db._writer:
+                if self._polling_task.done():
+                    await self._polling_task
+                await asyncio.sleep(0.01)
+        else:
+            await self.dp.emit_startup(bot=self.bot, dispatcher=self.dp)
+
+    async def stop(self):
+        if self._polling_task:
+            await self.dp.stop_polling()
+            await self._polling_task
+        else:
+            await self.dp.emit_shutdown(bot=self.bot, dispatcher=self.dp)
+        await self.bot.session.close()
+
+    def submit(self, kind: str, payload: dict):
+        update_id = next(self._update_ids)
+        data = {"update_id": update_id, kind: payload}
+        self._pending.add(update_id)
+        self._done.clear()
+        self._submitted[update_id] = time.perf_counter()
+        if self.mode == "polling":
+            self.api.push_update(data)
+        else:
+            task = asyncio.create_task(self._feed(data))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return update_id
+
+    async def _feed(self, data):
+        async with self.semaphore:
+            await self.dp.feed_update(self.bot, Update.model_validate(data, context={"bot": self.bot}))
+
+    async def drain(self):
+        if self._pending:
+            await self._done.wait()
+
+    def tap(self, user_id, data, message=None):
+        payload = {"id": str(next(self._update_ids)), "from": user(user_id), "chat_instance": "load", "data": data}
+        if message:
+            payload["message"] = message
+        return self.submit("callback_query", payload)
+
+    def send(self, user_id, text):
+        return self.submit("message", private_message(user_id, next(self._update_ids), text))
+
+    async def step(self, label, action):
+        """
+        Runs one scenario and prints its numbers.
+        """
+        self.latencies.clear()
+        self.errors.clear()
+        self.db_ops.clear()
+        self.api.reset_stats()
+
+        started = time.perf_counter()
+        updates = await action()
+        await self.drain()
+        elapsed = time.perf_counter() - started
+
+        api_calls = sum(n for method, n in self.api.calls.items() if method != "getUpdates")
+        ms = [1000 * x for x in self.latencies]
+        print(f"{label:<8} {updates:>7} {updates / elapsed:>9.0f} "
+              f"{percentile(ms, 0.50):>8.1f} {percentile(ms, 0.95):>8.1f} {percentile(ms, 0.99):>8.1f} "
+              f"{sum(self.db_ops.values()) / elapsed:>9.0f} {api_calls / max(updates, 1):>8.2f}")
+        breakdown = ", ".join(f"{m} {n}" for m, n in self.api.calls.most_common() if m != "getUpdates")
+        print(f"{'':8} api: {breakdown or '-'}")
+        if self.api.errors or self.errors:
+            print(f"{'':8} injected errors: {sum(self.api.errors.values())}, failed updates: {dict(self.errors)}")
+        late = sum(1 for method, params in self.api.requests
+                   if method == "answerCallbackQuery" and params.get("text", "").startswith(LATE_ANSWER))
+        if late:
+            print(f"{'':8} answered before the subscription check: {late}")
+        self.late_answers += late
+
+    def last_markup(self):
+        """
+        callback_data of the buttons on the last message the bot edited.
+        """
+        for method, params in reversed(self.api.requests):
+            if method == "editMessageText" and "reply_markup" in params:
+                markup = json.loads(params["reply_markup"])
+                return [b.get("callback_data", "") for row in markup["inline_keyboard"] for b in row]
+        return []
+
+async def run(args):
+    api = FakeBotAPI(latency=args.latency, jitter=args.jitter)
+    await api.start(port=FAKE_API_PORT)
+
+    if not args.rate_limits:
+        for attr in ("global_rate", "other_rate", "chat_rate", "chat_burst", "private_rate", "private_burst"):
+            setattr(api_scheduler, attr, 1e9)
+
+    test = LoadTest(api, args.mode, args.concurrency)
+    await test.start()
+    # Errors are injected once the bot is up, startup itself does not retry
+    api.error_rate, api.flood_rate = args.error_rate, args.flood_rate
+    try:
+        channels = ",".join(str(-1001000000000 - i) for i in range(args.channels))
+        giveaway_id = await db.create_giveaway("Load test\nPrize", channels, None, None, "Участвую", -1001999999999)
+        await db.set_publish_message_id(giveaway_id, 1)
+        admin_chat = {"message_id": 1, "date": int(time.time()), "chat": {"id": ADMIN_ID, "type": "private"}, "text": "-"}
+
+        print(f"mode: {args.mode}, users: {args.users}, taps per user: {args.taps}, channels: {args.channels}, "
+              f"API latency: {args.latency * 1000:.0f}+{args.jitter * 1000:.0f} ms, "
+              f"errors: {args.error_rate:.1%} 500 / {args.flood_rate:.1%} 429, "
+              f"rate limits: {'on' if args.rate_limits else 'off'}")
+        print(f"{'scenario':<8} {'updates':>7} {'upd/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'db ops/s':>9} {'api/upd':>8}")
+
+        async def storm():
+            for _ in range(args.taps):
+                for user_id in range(2, args.users + 2):
+                    test.tap(user_id, f"participate_{giveaway_id}")
+            return args.users * args.taps
+
+        async def admin():
+            # Each step depends on the previous screen, so they go one by one
+            updates = 0
+            async def do(update_id):
+                nonlocal updates
+                updates += 1
+                while update_id in test._pending:
+                    await asyncio.sleep(0.001)
+
+            await do(test.send(ADMIN_ID, "👥 Список участников"))
+            await do(test.tap(ADMIN_ID, f"part_gw_{giveaway_id}", admin_chat))
+            for _ in range(args.pages):
+                forward = [d for d in test.last_markup() if d.startswith(f"part_gw_{giveaway_id}_") and "_n" in d]
+                if not forward:
+                    break
+                await do(test.tap(ADMIN_ID, forward[0], admin_chat))
+            pick = next((d for d in test.last_markup() if d.startswith("pick_winner_")), None)
+            if pick:
+                await do(test.tap(ADMIN_ID, pick, admin_chat))
+            await do(test.tap(ADMIN_ID, f"pick_random_{giveaway_id}_3", admin_chat))
+            await do(test.tap(ADMIN_ID, f"finish_gw_{giveaway_id}", admin_chat))
+            return updates
+
+        async def results():
+            for user_id in range(2, args.users + 2):
+                test.send(user_id, f"/start res_{giveaway_id}")
+            return args.users
+
+        await test.step("storm", storm)
+        await test.step("admin", admin)
+        await test.step("results", results)
+    finally:
+        await test.stop()
+        await api.stop()
+    return 1 if test.late_answers else 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--mode", choices=("feed", "polling"), default="feed")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--taps", type=int, default=2, help="participate taps per user")
+    parser.add_argument("--channels", type=int, default=2, help="channels to be subscribed to")
+    parser.add_argument("--pages", type=int, default=5, help="participant pages the admin flips through")
+    parser.add_argument("--concurrency", type=int, default=100, help="updates handled at once in feed mode")
+    parser.add_argument("--latency", type=float, default=0.02, help="Bot API latency, seconds")
+    parser.add_argument("--jitter", type=float, default=0.01, help="random extra latency, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls failing with 500")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="share of calls failing with 429")
+    parser.add_argument("--rate-limits", action="store_true", help="keep Telegram's flood limits on")
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+End-to-end check that bots hosted in one process keep out of each other's
+giveaways.
+
+    python -m benchmarks.multibot_e2e
+
+Runs two bots on one Dispatcher against benchmarks.fake_bot_api. A giveaway
+of the first bot gets participants, then the admin taps its draw, pick,
+participant list, export, re-check, finish and delete buttons through the
+second bot: every one must answer "not found" and leave the giveaway as it
+was. The same draw and delete through the first bot must go through.
+"""
+import asyncio
+import itertools
+import os
+import tempfile
+import time
+
+FAKE_API_PORT = 18084
+ADMIN_ID = 1
+
+tmp = tempfile.TemporaryDirectory()
+os.environ.update({
+    "BOT_TOKENS": "111:first-token,222:second-token",
+    "ADMIN_IDS": str(ADMIN_ID),
+    "DB_PATH": os.path.join(tmp.name, "bot.db"),
+    "WEBHOOK_URL": "",
+    "TELEGRAM_API_URL": f"http://127.0.0.1:{FAKE_API_PORT}",
+})
+
+from aiogram.types import Update
+
+from benchmarks.fake_bot_api import FakeBotAPI
+from bot.database.core import db
+from bot.main import create_bots, create_dispatcher
+from bot.ratelimit import api_scheduler
+from bot.tenants import bot_scope
+
+PARTICIPANTS = 20
+
+def last_answer(api):
+    return next(params.get("text", "") for method, params in reversed(api.requests) if method == "answerCallbackQuery")
+
+async def main():
+    api = FakeBotAPI()
+    await api.start(port=FAKE_API_PORT)
+    # Only isolation is checked here, not the flood limits
+    for attr in ("global_rate", "other_rate", "chat_rate", "chat_burst", "private_rate", "private_burst"):
+        setattr(api_scheduler, attr, 1e9)
+    owner, other = create_bots()
+    dp = create_dispatcher()
+    await dp.emit_startup(dispatcher=dp, bots=[owner, other])
+    update_ids = itertools.count(1)
+
+    async def tap(bot, data):
+        update_id = next(update_ids)
+        update = {"update_id": update_id, "callback_query": {
+            "id": str(update_id),
+            "from": {"id": ADMIN_ID, "is_bot": False, "first_name": "Admin"},
+            "chat_instance": "e2e",
+            "data": data,
+            "message": {"message_id": 1, "date": int(time.time()), "chat": {"id": ADMIN_ID, "type": "private"}, "text": "-"},
+        }}
+        await dp.feed_update(bot, Update.model_validate(update, context={"bot": bot}))
+        return last_answer(api)
+
+    try:
+        with bot_scope(owner.id):
+            giveaway_id = await db.create_giveaway("e2e", "-1001", None, None, "Участвую", -1002)
+        for user_id in range(100, 100 + PARTICIPANTS):
+            await db.create_user(user_id, f"user{user_id}", f"User {user_id}")
+            await db.add_participant(user_id, giveaway_id)
+
+        for data in (f"pick_random_{giveaway_id}_3", f"pick_winner_{giveaway_id}_100", f"part_gw_{giveaway_id}",
+                     f"export_gw_{giveaway_id}_csv", f"verify_gw_{giveaway_id}", f"finish_gw_{giveaway_id}",
+                     f"delete_gw_{giveaway_id}"):
+            answer = await tap(other, data)
+            assert "не найден" in answer, (data, answer)
+
+        giveaway = await db.get_giveaway(giveaway_id)
+        assert giveaway and giveaway['status'] == 'active', "giveaway changed through another bot"
+        assert not await db.get_winners(giveaway_id), "winners drawn through another bot"
+        assert not await db.get_verification_job(giveaway_id), "re-check started through another bot"
+
+        await tap(owner, f"pick_random_{giveaway_id}_3")
+        assert len(await db.get_winners(giveaway_id)) == 3
+        assert "удален" in await tap(owner, f"delete_gw_{giveaway_id}")
+        assert await db.get_giveaway(giveaway_id) is None
+    finally:
+        await dp.emit_shutdown(dispatcher=dp, bots=[owner, other])
+        await owner.session.close()
+        await api.stop()
+    print("multibot e2e: OK", dict(api.bot_calls))
+
+if __name__ == "__main__":
+    asyncio.run(main())
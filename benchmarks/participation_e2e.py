@@ -0,0 +1,84 @@
+"""
+End-to-end check of the participate handler behind ParticipationGate.
+
+    python -m benchmarks.participation_e2e
+
+Runs the Dispatcher against benchmarks.fake_bot_api and taps participate
+while storing the participant fails. The tap must be answered with the
+error, the gate must not remember the user as joined, and the next tap,
+with the database back, must store the participant.
+"""
+import asyncio
+import os
+import tempfile
+
+FAKE_API_PORT = 18083
+
+tmp = tempfile.TemporaryDirectory()
+os.environ.update({
+    "BOT_TOKEN": "1000:fake-token",
+    "ADMIN_IDS": "1",
+    "DB_PATH": os.path.join(tmp.name, "bot.db"),
+    "WEBHOOK_URL": "",
+    "TELEGRAM_API_URL": f"http://127.0.0.1:{FAKE_API_PORT}",
+})
+
+from aiogram.types import Update
+
+from benchmarks.fake_bot_api import FakeBotAPI
+from bot.database.core import db
+from bot.main import create_bot, create_dispatcher
+from bot.participation import participation_gate
+
+USER_ID = 42
+
+def callback_update(update_id, user_id, data):
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User {user_id}"},
+            "chat_instance": "e2e",
+            "data": data,
+        },
+    }
+
+def last_answer(api):
+    return next(params.get("text", "") for method, params in reversed(api.requests) if method == "answerCallbackQuery")
+
+async def main():
+    api = FakeBotAPI()
+    await api.start(port=FAKE_API_PORT)
+    bot = create_bot()
+    dp = create_dispatcher()
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+    try:
+        giveaway_id = await db.create_giveaway("e2e", "-1001", None, None, "Участвую", -1002)
+
+        async def tap(update_id):
+            update = callback_update(update_id, USER_ID, f"participate_{giveaway_id}")
+            await dp.feed_update(bot, Update.model_validate(update, context={"bot": bot}))
+
+        add_participant = db.add_participant
+        async def failing_add_participant(user_id, giveaway_id):
+            raise RuntimeError("disk I/O error")
+        db.add_participant = failing_add_participant
+        try:
+            await tap(1)
+        finally:
+            db.add_participant = add_participant
+        assert last_answer(api).startswith("❌"), last_answer(api)
+        assert not participation_gate._joined.get((USER_ID, giveaway_id)), "failed tap remembered as joined"
+
+        await tap(2)
+        assert last_answer(api).startswith("✅"), last_answer(api)
+        assert participation_gate._joined.get((USER_ID, giveaway_id))
+        assert await db.get_participants_count(giveaway_id) == 1
+    finally:
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        await bot.session.close()
+        await api.stop()
+    print("participation e2e: OK", dict(api.calls))
+
+if __name__ == "__main__":
+    asyncio.run(main())
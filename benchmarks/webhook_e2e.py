@@ -0,0 +1,79 @@
+"""
+End-to-end check of webhook mode against the fake Bot API.
+
+    python -m benchmarks.webhook_e2e
+
+Starts benchmarks.fake_bot_api, runs the bot's webhook app on a local port,
+delivers a participation tap through the webhook and checks that it was
+answered and stored, that a wrong secret token is rejected, and that
+shutdown is clean.
+"""
+import asyncio
+import os
+import tempfile
+
+FAKE_API_PORT = 18081
+WEBHOOK_PORT = 18080
+
+tmp = tempfile.TemporaryDirectory()
+os.environ.update({
+    "BOT_TOKEN": "1000:fake-token",
+    "ADMIN_IDS": "1",
+    "DB_PATH": os.path.join(tmp.name, "bot.db"),
+    "WEBHOOK_URL": f"http://127.0.0.1:{WEBHOOK_PORT}",
+    "WEBHOOK_SECRET": "e2e-secret",
+    "TELEGRAM_API_URL": f"http://127.0.0.1:{FAKE_API_PORT}",
+})
+
+from aiohttp import ClientSession, web
+
+from benchmarks.fake_bot_api import FakeBotAPI
+from bot.config import WEBHOOK_PATH, WEBHOOK_SECRET
+from bot.database.core import db
+from bot.main import create_bot, create_dispatcher, create_webhook_app
+
+def callback_update(update_id, user_id, data):
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User {user_id}"},
+            "chat_instance": "e2e",
+            "data": data,
+        },
+    }
+
+async def main():
+    api = FakeBotAPI()
+    await api.start(port=FAKE_API_PORT)
+
+    runner = web.AppRunner(create_webhook_app([create_bot()], create_dispatcher()))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", WEBHOOK_PORT).start()
+    try:
+        await api.wait_for("setWebhook")
+        _, params = next(r for r in api.requests if r[0] == "setWebhook")
+        assert params["secret_token"] == WEBHOOK_SECRET, params
+
+        giveaway_id = await db.create_giveaway("e2e", "-1001", None, None, "Участвую", -1002)
+        url = f"http://127.0.0.1:{WEBHOOK_PORT}{WEBHOOK_PATH}"
+
+        async with ClientSession() as http:
+            update = callback_update(1, 42, f"participate_{giveaway_id}")
+            async with http.post(url, json=update, headers={"X-Telegram-Bot-Api-Secret-Token": WEBHOOK_SECRET}) as resp:
+                assert resp.status == 200, resp.status
+            await api.wait_for("answerCallbackQuery")
+            assert await db.get_participants_count(giveaway_id) == 1
+
+            update = callback_update(2, 43, f"participate_{giveaway_id}")
+            async with http.post(url, json=update, headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"}) as resp:
+                assert resp.status == 401, resp.status
+    finally:
+        await runner.cleanup()
+        await api.stop()
+
+    assert db._writer is None, "database was not closed on shutdown"
+    print("webhook e2e: OK", dict(api.calls))
+
+if __name__ == "__main__":
+    asyncio.run(main())
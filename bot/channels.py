@@ -0,0 +1,120 @@
+import asyncio
+import logging
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from bot.database.core import db
+from bot.ratelimit import background
+from bot.tenants import bot_scope, get_bot
+from bot.utils import is_bot_admin, prepare_channel_id
+
+logger = logging.getLogger(__name__)
+
+# Directory rows are refreshed by my_chat_member updates as they happen;
+# the sweep only catches what updates can't tell (renames, new usernames).
+SWEEP_INTERVAL = 6 * 3600
+CHANNEL_MAX_AGE = "-1 day"
+
+def channel_line(channel_id, row=None) -> str:
+    if row is None:
+        return f"👉 Канал {channel_id}"
+    if row['username']:
+        return f"👉 <a href='https://t.me/{row['username']}'>{row['title']}</a>"
+    return f"👉 {row['title']}"
+
+async def subscribe_text(channel_ids) -> str:
+    """
+    The "subscribe to" block appended to a giveaway post, from the directory.
+    """
+    rows = await db.get_channels(channel_ids)
+    return "\n\n📢 <b>Подпишись на:</b>\n" + "\n".join(channel_line(cid, rows.get(cid)) for cid in channel_ids)
+
+async def channel_titles(channel_ids) -> list:
+    rows = await db.get_channels(channel_ids)
+    return [rows[cid]['title'] if cid in rows else str(cid) for cid in channel_ids]
+
+def _directory_ref(channel_input: str):
+    # Numeric id or @username as stored in the directory, None for links
+    channel_input = channel_input.strip()
+    if channel_input.lstrip("-").isdigit():
+        return int(channel_input) if channel_input.startswith("-") else int(f"-100{channel_input}")
+    if "/" in channel_input or "+" in channel_input:
+        return None
+    return channel_input
+
+async def resolve_channel(bot: Bot, channel_input: str):
+    """
+    Channel id for admin input, answered from the directory when the bot is
+    known to be an admin there. Returns (chat_id, error) where error is
+    None, "not_found" or "not_admin".
+    """
+    ref = _directory_ref(channel_input)
+    if ref is not None:
+        row = await db.find_channel(ref)
+        if row and row['is_admin']:
+            return row['channel_id'], None
+
+    chat_id, chat = await prepare_channel_id(bot, channel_input)
+    if not chat_id:
+        return None, "not_found"
+    is_admin = await is_bot_admin(bot, chat_id)
+    await db.add_admin_channel(chat.id, chat.title, chat.username, chat.type, is_admin)
+    return chat_id, None if is_admin else "not_admin"
+
+class ChannelSweeper:
+    """
+    Re-reads stale directory rows from Telegram at background priority:
+    title, username and whether the bot is still an admin. Each row is
+    refreshed by the bot it belongs to.
+    """
+    def __init__(self, interval: float = SWEEP_INTERVAL, max_age: str = CHANNEL_MAX_AGE):
+        self.interval = interval
+        self.max_age = max_age
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception:
+                logger.exception("Channel sweep failed")
+            await asyncio.sleep(self.interval)
+
+    async def sweep(self) -> int:
+        rows = await db.get_stale_channels(self.max_age)
+        with background():
+            for row in rows:
+                bot = get_bot(row['bot_id'])
+                if not bot:
+                    continue
+                with bot_scope(bot.id):
+                    await self._refresh(bot, row['channel_id'])
+        if rows:
+            logger.info("Refreshed %s channels", len(rows))
+        return len(rows)
+
+    async def _refresh(self, bot: Bot, channel_id):
+        try:
+            chat = await bot.get_chat(channel_id)
+        except (TelegramBadRequest, TelegramForbiddenError) as e:
+            # The channel is gone or the bot was removed from it
+            logger.info("Channel %s is no longer reachable: %s", channel_id, e)
+            await db.remove_admin_channel(channel_id)
+            return
+        except Exception as e:
+            logger.warning("Failed to refresh channel %s: %s", channel_id, e)
+            return
+        is_admin = await is_bot_admin(bot, chat.id)
+        await db.add_admin_channel(chat.id, chat.title, chat.username, chat.type, is_admin)
+
+channel_sweeper = ChannelSweeper()
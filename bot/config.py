@@ -1,7 +1,57 @@
+import hashlib
 import os
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
 from dotenv import load_dotenv
 
 load_dotenv()
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+# Several bots can run in one process: BOT_TOKENS=token1,token2. They share
+# the database, the HTTP session and the background tasks, each bot only
+# sees its own giveaways and channels.
+BOT_TOKENS = [token.strip() for token in (os.getenv("BOT_TOKENS") or BOT_TOKEN or "").split(",") if token.strip()]
 ADMIN_IDS = [int(id_str) for id_str in os.getenv("ADMIN_IDS", "").split(",") if id_str]
+
+# Seconds to wait before answering a participation tap (0 = answer right away)
+PARTICIPATE_DELAY = float(os.getenv("PARTICIPATE_DELAY", "0"))
+
+DB_PATH = os.getenv("DB_PATH", "data/bot.db")
+
+# Time zone in which admins enter and see giveaway end times. Zone data
+# comes from the tzdata package where the system has none (slim images).
+TIMEZONE = os.getenv("TIMEZONE") or "Europe/Moscow"
+try:
+    LOCAL_TZ = ZoneInfo(TIMEZONE)
+except (ZoneInfoNotFoundError, ValueError) as e:
+    raise SystemExit(f"Unknown TIMEZONE {TIMEZONE!r}, expected an IANA name like Europe/Moscow") from e
+
+# Webhook mode is used when WEBHOOK_URL (public https base URL) is set,
+# long polling otherwise
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+# With several bots each one gets WEBHOOK_PATH/<bot id>.
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+# Telegram sends it back in X-Telegram-Bot-Api-Secret-Token. Every instance
+# behind a load balancer needs the same value, so the default is derived
+# from the token rather than random.
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+
+def webhook_secret(token: str) -> str:
+    return WEBHOOK_SECRET or hashlib.sha256(token.encode()).hexdigest()[:32]
+
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "0.0.0.0")
+WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", "8080"))
+
+# Other Bot API server (self-hosted or a fake one in tests), e.g. http://localhost:8081
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+
+# Prometheus metrics on http://METRICS_HOST:METRICS_PORT/metrics (0 = off).
+# Local only by default, put a scraper or a proxy next to the bot.
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9090"))
+
+# LOG_JSON=1 writes one JSON object per line. Per-tap debug events (only
+# logged at LOG_LEVEL=DEBUG) are kept with probability LOG_SAMPLE_RATE.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_JSON = os.getenv("LOG_JSON", "0").lower() in ("1", "true", "yes")
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1"))
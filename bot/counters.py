@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import time
+
+from bot.database.core import db
+from bot.keyboards.giveaway import giveaway_post_keyboard
+from bot.ratelimit import api_scheduler, background
+from bot.tenants import bot_scope, get_bot
+from bot.utils import resolve_share_url
+
+logger = logging.getLogger(__name__)
+
+class CounterUpdater:
+    """
+    Keeps the "Участвую (N)" button on published posts up to date.
+
+    add_participant marks a giveaway dirty, and only dirty posts get edited.
+    A busy post is edited at most once per `window` seconds: all joins that
+    happen in between are folded into that one edit.
+    """
+    def __init__(self, window: float):
+        self.window = window
+        self._dirty = set()
+        self._wakeup = asyncio.Event()
+        self._last_edit = {}   # giveaway_id -> monotonic time of the last edit
+        self._last_count = {}  # giveaway_id -> count currently shown on the post
+
+    def mark_dirty(self, giveaway_id):
+        self._dirty.add(giveaway_id)
+        self._wakeup.set()
+
+    def forget(self, giveaway_id):
+        """
+        Drops all state of a finished or deleted giveaway.
+        """
+        self._dirty.discard(giveaway_id)
+        self._last_edit.pop(giveaway_id, None)
+        self._last_count.pop(giveaway_id, None)
+
+    def stats(self) -> dict:
+        return {"dirty": len(self._dirty), "tracked": len(self._last_count)}
+
+    async def run(self):
+        # Sync every live post once, e.g. after a restart
+        for giveaway in await db.get_active_giveaways():
+            self.mark_dirty(giveaway['id'])
+
+        # Counter edits must never delay answers to users
+        with background():
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+
+                now = time.monotonic()
+                due = [gw_id for gw_id in self._dirty if now - self._last_edit.get(gw_id, 0) >= self.window]
+                for gw_id in due:
+                    self._dirty.discard(gw_id)
+                    self._last_edit[gw_id] = now
+                await asyncio.gather(*(self._refresh(gw_id) for gw_id in due))
+
+                if self._dirty:
+                    # Come back when the earliest debounced post may be edited again
+                    next_due = min(self._last_edit.get(gw_id, 0) for gw_id in self._dirty) + self.window
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), max(0, next_due - time.monotonic()))
+                    except asyncio.TimeoutError:
+                        pass
+                    self._wakeup.set()
+
+    async def _refresh(self, giveaway_id):
+        try:
+            giveaway = await db.get_giveaway_info(giveaway_id)
+            # The post is edited by the bot that published it
+            bot = get_bot(giveaway.bot_id) if giveaway else None
+            if not bot or not giveaway.publish_message_id or not giveaway.publish_channel_id:
+                self.forget(giveaway_id)
+                return
+
+            count = await db.get_participants_count(giveaway_id)
+            if self._last_count.get(giveaway_id) == count:
+                return
+
+            # Only giveaways published before share URLs were stored need the row
+            with bot_scope(bot.id):
+                share_url = giveaway.share_url or await resolve_share_url(bot, await db.get_giveaway(giveaway_id))
+            markup = giveaway_post_keyboard(giveaway_id, giveaway.button_text, count, share_url)
+
+            try:
+                await bot.edit_message_reply_markup(
+                    chat_id=giveaway.publish_channel_id,
+                    message_id=giveaway.publish_message_id,
+                    reply_markup=markup
+                )
+                self._last_count[giveaway_id] = count
+                logger.info("Updated counter for giveaway #%s to %s", giveaway_id, count)
+            except Exception as e:
+                error = str(e).lower()
+                if "message to edit not found" in error:
+                    self.forget(giveaway_id)
+                elif "is not modified" in error:
+                    self._last_count[giveaway_id] = count
+                else:
+                    logger.error("Failed to update counter for giveaway #%s: %s", giveaway_id, e)
+        except Exception:
+            logger.exception("Error in background counter updater")
+
+# One edit per post per per-chat rate window of the API scheduler
+counter_updater = CounterUpdater(window=1 / api_scheduler.chat_rate)
+db.add_listener("participant_added", counter_updater.mark_dirty)
+db.add_listener("giveaway_closed", counter_updater.forget)
@@ -1,188 +1,730 @@
 import aiosqlite
+import asyncio
+import json
 import logging
 import os
+from contextlib import asynccontextmanager
+from bot.config import DB_PATH
+from bot.database.migrations import run_migrations
+from bot.database.giveaways import GiveawayInfo, parse_channel_ids
+from bot.tenants import current_bot_id, default_bot_id
+
+logger = logging.getLogger(__name__)
+
+# Applied to every connection. WAL lets the readers keep going while the
+# writer commits; synchronous=NORMAL is durable enough in WAL mode.
+CONNECTION_PRAGMAS = (
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 134217728",
+)
+
+# Statements that go through the write-behind batch (see Database._enqueue)
+UPSERT_USER_SQL = """
+    INSERT INTO users (id, username, full_name) VALUES (?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET username = excluded.username, full_name = excluded.full_name
+"""
+INSERT_PARTICIPANT_SQL = "INSERT OR IGNORE INTO participants (user_id, giveaway_id) VALUES (?, ?)"
+READMIT_PARTICIPANT_SQL = """
+    UPDATE participants SET eligible = 1, verified_at = CURRENT_TIMESTAMP
+    WHERE user_id = ? AND giveaway_id = ? AND eligible = 0
+"""
+
+UPSERT_CHANNEL_MEMBER_SQL = """
+    INSERT INTO channel_members (channel_id, user_id, status, updated_at) VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(channel_id, user_id) DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at
+"""
+
+# How long a passed re-check lets the draw skip asking Telegram again
+VERIFIED_MAX_AGE = "-6 hours"
+
+def _owner() -> int:
+    # Rows belong to the bot in scope, outside any update to the first one
+    return current_bot_id() or default_bot_id() or 0
+
+def _scoped(where: str, params=()):
+    """
+    Limits a WHERE clause to the bot in scope. Background work runs
+    outside any bot's scope and sees the rows of all bots.
+    """
+    bot_id = current_bot_id()
+    if bot_id is None:
+        return where, tuple(params)
+    return f"{where} AND bot_id = ?", (*params, bot_id)
+
+def _scoped_giveaway(where: str, params=(), column: str = "giveaway_id"):
+    """
+    _scoped for tables keyed by giveaway: limits the rows to giveaways
+    of the bot in scope.
+    """
+    bot_id = current_bot_id()
+    if bot_id is None:
+        return where, tuple(params)
+    return f"{where} AND EXISTS (SELECT 1 FROM giveaways g WHERE g.id = {column} AND g.bot_id = ?)", (*params, bot_id)
 
 class Database:
-    def __init__(self, db_path: str = "data/bot.db"):
+    def __init__(self, db_path: str = "data/bot.db", readers: int = 4,
+                 batch_writes: bool = True, batch_delay: float = 0.005, batch_size: int = 500):
         self.db_path = db_path
+        self.readers = readers
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
 
-    async def create_tables(self):
-        async with aiosqlite.connect(self.db_path) as db:
-            # Users table
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY,
-                    username TEXT,
-                    full_name TEXT,
-                    joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Giveaways table
-            # status: active, finished
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS giveaways (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    channel_ids TEXT, 
-                    description TEXT,
-                    media_id TEXT,
-                    media_type TEXT,
-                    button_text TEXT,
-                    publish_channel_id INTEGER,
-                    publish_message_id INTEGER,
-                    end_time TIMESTAMP,
-                    status TEXT DEFAULT 'active',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            # Participants table
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS participants (
-                    user_id INTEGER,
-                    giveaway_id INTEGER,
-                    is_winner BOOLEAN DEFAULT 0,
-                    joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    PRIMARY KEY (user_id, giveaway_id),
-                    FOREIGN KEY (user_id) REFERENCES users(id),
-                    FOREIGN KEY (giveaway_id) REFERENCES giveaways(id)
-                )
-            """)
-            
-            # Admin Channels table
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS admin_channels (
-                    channel_id INTEGER PRIMARY KEY,
-                    title TEXT
-                )
-            """)
+        self._writer = None
+        self._write_lock = asyncio.Lock()
+        self._reader_pool = None
+        self._reader_conns = []
+
+        # Write-behind batching for user upserts and participant inserts
+        self.batch_writes = batch_writes
+        self.batch_delay = batch_delay
+        self.batch_size = batch_size
+        self._batch = []
+        self._batch_ready = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._batch_task = None
+        self._closing = False
+        self._detached = set()  # unbatched _enqueue_nowait writes
+
+        # giveaway_id -> GiveawayInfo of every active giveaway, None until
+        # load_active_giveaways(). Updated by the methods that write them.
+        self._active = None
+
+        # event name -> callbacks, see add_listener()
+        self._listeners = {}
+
+    async def _connect(self):
+        conn = await aiosqlite.connect(self.db_path)
+        conn.row_factory = aiosqlite.Row
+        for pragma in CONNECTION_PRAGMAS:
+            await self._pragma(conn, pragma)
+        return conn
+
+    @staticmethod
+    async def _pragma(conn, pragma):
+        # Pragmas that return a row keep their statement (and its lock) alive
+        # until the cursor is closed.
+        async with conn.execute(pragma):
+            pass
+
+    async def open(self):
+        """
+        Opens the long-lived writer connection and the reader pool.
+        Must be called once at startup before any other method.
+        """
+        if self._writer is not None:
+            return
+
+        self._writer = await self._connect()
+        await self._pragma(self._writer, "PRAGMA journal_mode = WAL")
+
+        self._reader_pool = asyncio.Queue()
+        for _ in range(self.readers):
+            conn = await self._connect()
+            await self._pragma(conn, "PRAGMA query_only = ON")
+            self._reader_conns.append(conn)
+            self._reader_pool.put_nowait(conn)
+
+        if self.batch_writes:
+            self._closing = False
+            self._batch_task = asyncio.create_task(self._batch_loop())
+        logger.info("Database opened: %s (1 writer, %s readers)", self.db_path, self.readers)
+
+    async def close(self):
+        if self._writer is None:
+            return
 
-            # Migrations (for existing DB)
+        # Flush whatever is still queued before the writer goes away
+        if self._batch_task:
+            self._closing = True
+            self._batch_ready.set()
+            self._batch_full.set()
+            await self._batch_task
+            self._batch_task = None
+        await asyncio.gather(*self._detached)
+
+        async with self._write_lock:
+            await self._writer.commit()
+            await self._writer.close()
+            self._writer = None
+
+        for conn in self._reader_conns:
+            await conn.close()
+        self._reader_conns = []
+        self._reader_pool = None
+        logger.info("Database closed.")
+
+    @asynccontextmanager
+    async def writer(self):
+        """
+        Exclusive access to the single writer connection.
+        Uncommitted changes are rolled back if the block raises.
+        """
+        if self._writer is None:
+            raise RuntimeError("Database is not open, call db.open() first")
+        async with self._write_lock:
             try:
-                await db.execute("ALTER TABLE giveaways ADD COLUMN publish_channel_id INTEGER")
-            except Exception: pass
+                yield self._writer
+            except Exception:
+                await self._writer.rollback()
+                raise
+
+    @asynccontextmanager
+    async def reader(self):
+        """
+        Borrows a read-only connection from the pool.
+        """
+        if self._reader_pool is None:
+            raise RuntimeError("Database is not open, call db.open() first")
+        conn = await self._reader_pool.get()
+        try:
+            yield conn
+        finally:
+            self._reader_pool.put_nowait(conn)
+
+    def add_listener(self, event, callback):
+        """
+        Registers a plain (non-async) callback for a data change event:
+        "participant_added" (giveaway_id), "giveaway_closed" (giveaway_id)
+        or "end_time_changed" (giveaway_id, end_time or None).
+        """
+        self._listeners.setdefault(event, []).append(callback)
+
+    def stats(self) -> dict:
+        return {
+            "pending_writes": len(self._batch),
+            "idle_readers": self._reader_pool.qsize() if self._reader_pool else 0,
+        }
+
+    def _emit(self, event, *args):
+        for callback in self._listeners.get(event, ()):
             try:
-                await db.execute("ALTER TABLE giveaways ADD COLUMN publish_message_id INTEGER")
-            except Exception: pass
+                callback(*args)
+            except Exception:
+                logger.exception("Listener for %s failed", event)
+
+    async def _enqueue(self, sql, params):
+        """
+        Queues a write for the next batch and waits for its own result:
+        True if the statement changed a row, False otherwise.
+        """
+        if self._batch_task is None or self._closing:
+            async with self.writer() as db:
+                cursor = await db.execute(sql, params)
+                await db.commit()
+                return cursor.rowcount > 0
+
+        future = asyncio.get_running_loop().create_future()
+        self._batch.append((sql, params, future))
+        self._batch_ready.set()
+        if len(self._batch) >= self.batch_size:
+            self._batch_full.set()
+        return await future
+
+    def _enqueue_nowait(self, sql, params):
+        """
+        Queues a write for the next batch without waiting for it. Only for
+        data that is fine to lose if the batch fails.
+        """
+        if self._batch_task is None or self._closing:
+            task = asyncio.ensure_future(self._write_detached(sql, params))
+            self._detached.add(task)
+            task.add_done_callback(self._detached.discard)
+            return
+
+        self._batch.append((sql, params, None))
+        self._batch_ready.set()
+        if len(self._batch) >= self.batch_size:
+            self._batch_full.set()
+
+    async def _write_detached(self, sql, params):
+        try:
+            await self._enqueue(sql, params)
+        except Exception:
+            logger.exception("Unbatched write failed")
+
+    async def _batch_loop(self):
+        while True:
+            await self._batch_ready.wait()
+            if not self._closing and len(self._batch) < self.batch_size:
+                # Give the rest of the burst a few ms to join this transaction
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), self.batch_delay)
+                except asyncio.TimeoutError:
+                    pass
+            self._batch_ready.clear()
+            self._batch_full.clear()
+
             try:
-                await db.execute("ALTER TABLE participants ADD COLUMN is_winner BOOLEAN DEFAULT 0")
-            except Exception: pass
+                await self._flush_batch()
+            except Exception:
+                logger.exception("Failed to flush write batch")
+
+            if self._closing and not self._batch:
+                return
+
+    async def _flush_batch(self):
+        batch, self._batch = self._batch[:self.batch_size], self._batch[self.batch_size:]
+        if self._batch:
+            self._batch_ready.set()
+        if not batch:
+            return
+
+        results = []
+        try:
+            async with self.writer() as db:
+                for sql, params, _ in batch:
+                    cursor = await db.execute(sql, params)
+                    results.append(cursor.rowcount > 0)
+                await db.commit()
+        except Exception as e:
+            for _, _, future in batch:
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            raise
+
+        for (_, _, future), result in zip(batch, results):
+            if future is not None and not future.done():
+                future.set_result(result)
+
+    async def migrate(self):
+        async with self.writer() as db:
+            version = await run_migrations(db)
+            logger.info("Database schema is at version %s.", version)
 
+    async def adopt_rows(self, bot_id):
+        """
+        Hands giveaways and channels from before multi-bot hosting to bot_id.
+        """
+        async with self.writer() as db:
+            await db.execute("UPDATE giveaways SET bot_id = ? WHERE bot_id = 0", (bot_id,))
+            await db.execute("UPDATE OR IGNORE admin_channels SET bot_id = ? WHERE bot_id = 0", (bot_id,))
+            await db.execute("DELETE FROM admin_channels WHERE bot_id = 0")
             await db.commit()
-            logging.info("Tables created successfully.")
+        if self._active is not None:
+            for giveaway_id, info in self._active.items():
+                if info.bot_id == 0:
+                    self._active[giveaway_id] = info.updated(bot_id=bot_id)
 
-    async def create_giveaway(self, description, channel_ids, media_id, media_type, button_text, publish_channel_id):
-        async with aiosqlite.connect(self.db_path) as db:
+    async def create_giveaway(self, description, channel_ids, media_id, media_type, button_text, publish_channel_id,
+                              end_time=None, winners_count=1):
+        bot_id = _owner()
+        async with self.writer() as db:
             cursor = await db.execute("""
-                INSERT INTO giveaways (description, channel_ids, media_id, media_type, button_text, publish_channel_id, status)
-                VALUES (?, ?, ?, ?, ?, ?, 'active')
-            """, (description, channel_ids, media_id, media_type, button_text, publish_channel_id))
+                INSERT INTO giveaways (description, channel_ids, media_id, media_type, button_text, publish_channel_id,
+                                       end_time, winners_count, status, bot_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'active', ?)
+            """, (description, channel_ids, media_id, media_type, button_text, publish_channel_id, end_time, winners_count,
+                  bot_id))
             await db.commit()
-            return cursor.lastrowid
+        giveaway_id = cursor.lastrowid
+        if self._active is not None:
+            self._active[giveaway_id] = GiveawayInfo(
+                giveaway_id, tuple(parse_channel_ids(channel_ids)), button_text, publish_channel_id, None, None, 'active',
+                bot_id)
+        if end_time:
+            self._emit("end_time_changed", giveaway_id, end_time)
+        return giveaway_id
 
     async def get_active_giveaways(self):
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM giveaways WHERE status = 'active'") as cursor:
+        # Rows include participant_count, no per-giveaway COUNT(*) needed
+        async with self.reader() as db:
+            async with db.execute(*_scoped("SELECT * FROM giveaways WHERE status = 'active'")) as cursor:
+                return await cursor.fetchall()
+
+    async def get_scheduled_giveaways(self):
+        # (id, end_time) of active giveaways that finish on their own
+        async with self.reader() as db:
+            async with db.execute(*_scoped(
+                "SELECT id, end_time FROM giveaways WHERE status = 'active' AND end_time IS NOT NULL"
+            )) as cursor:
                 return await cursor.fetchall()
 
+    async def set_end_time(self, giveaway_id, end_time, winners_count=None):
+        # False if there is no such giveaway for the bot in scope
+        async with self.writer() as db:
+            cursor = await db.execute(*_scoped(
+                "UPDATE giveaways SET end_time = ?, winners_count = COALESCE(?, winners_count) WHERE id = ?",
+                (end_time, winners_count, giveaway_id)))
+            await db.commit()
+        if not cursor.rowcount:
+            return False
+        self._emit("end_time_changed", giveaway_id, end_time)
+        return True
+
+    async def load_active_giveaways(self):
+        async with self.reader() as db:
+            async with db.execute("SELECT * FROM giveaways WHERE status = 'active'") as cursor:
+                self._active = {row['id']: GiveawayInfo.from_row(row) for row in await cursor.fetchall()}
+        return len(self._active)
+
+    async def get_giveaway_info(self, giveaway_id):
+        """
+        GiveawayInfo of an active giveaway from memory, None if the giveaway
+        is finished, doesn't exist or belongs to another bot. Reads nothing
+        from disk once loaded.
+        """
+        if self._active is None:
+            await self.load_active_giveaways()
+        info = self._active.get(giveaway_id)
+        bot_id = current_bot_id()
+        if info is not None and bot_id is not None and info.bot_id != bot_id:
+            return None
+        return info
+
+    def _update_info(self, giveaway_id, **changes):
+        info = self._active.get(giveaway_id) if self._active is not None else None
+        if info is not None:
+            self._active[giveaway_id] = info.updated(**changes)
+
+    def _drop_info(self, giveaway_id):
+        if self._active is not None:
+            self._active.pop(giveaway_id, None)
+
     async def get_giveaway(self, giveaway_id):
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM giveaways WHERE id = ?", (giveaway_id,)) as cursor:
+        async with self.reader() as db:
+            async with db.execute(*_scoped("SELECT * FROM giveaways WHERE id = ?", (giveaway_id,))) as cursor:
                 return await cursor.fetchone()
     
     async def add_participant(self, user_id, giveaway_id):
-        async with aiosqlite.connect(self.db_path) as db:
-            try:
-                await db.execute("INSERT INTO participants (user_id, giveaway_id) VALUES (?, ?)", (user_id, giveaway_id))
-                await db.commit()
-                return True
-            except aiosqlite.IntegrityError:
-                return False # Already participating
+        # False means already participating
+        is_new = await self._enqueue(INSERT_PARTICIPANT_SQL, (user_id, giveaway_id))
+        if is_new:
+            self._emit("participant_added", giveaway_id)
+        else:
+            # Callers have just checked the subscriptions, so a failed re-check no longer applies
+            await self._enqueue(READMIT_PARTICIPANT_SQL, (user_id, giveaway_id))
+        return is_new
 
     async def get_participants_count(self, giveaway_id):
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("SELECT COUNT(*) FROM participants WHERE giveaway_id = ?", (giveaway_id,)) as cursor:
-                return (await cursor.fetchone())[0]
+        async with self.reader() as db:
+            async with db.execute(*_scoped("SELECT participant_count FROM giveaways WHERE id = ?", (giveaway_id,))) as cursor:
+                row = await cursor.fetchone()
+                return row[0] if row else 0
 
     async def get_participants(self, giveaway_id):
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.reader() as db:
             async with db.execute("SELECT u.* FROM participants p JOIN users u ON p.user_id = u.id WHERE p.giveaway_id = ?", (giveaway_id,)) as cursor:
                 return await cursor.fetchall()
     
+    async def get_participants_page(self, giveaway_id, from_user_id=None, before=False, limit=25):
+        """
+        Keyset page of participants in join order, (joined_at, user_id).
+
+        from_user_id is the cursor: the page starts at that participant
+        (inclusive), or with before=True ends right before them. No cursor
+        means the first page. Rows are u.* plus joined_at and is_winner,
+        always in ascending order.
+        """
+        columns = "u.*, p.joined_at AS joined_at, p.is_winner"
+        async with self.reader() as db:
+            if from_user_id is None:
+                where, params = _scoped_giveaway("WHERE p.giveaway_id = ?", (giveaway_id,), "p.giveaway_id")
+                query = f"""
+                    SELECT {columns} FROM participants p JOIN users u ON p.user_id = u.id
+                    {where}
+                    ORDER BY p.joined_at, p.user_id LIMIT ?
+                """
+            else:
+                op, order = ("<", "DESC") if before else (">=", "ASC")
+                where, params = _scoped_giveaway(f"""
+                    WHERE p.giveaway_id = ? AND (p.joined_at, p.user_id) {op} (
+                        SELECT joined_at, user_id FROM participants WHERE giveaway_id = ? AND user_id = ?
+                    )""", (giveaway_id, giveaway_id, from_user_id), "p.giveaway_id")
+                query = f"""
+                    SELECT {columns} FROM participants p JOIN users u ON p.user_id = u.id
+                    {where}
+                    ORDER BY p.joined_at {order}, p.user_id {order} LIMIT ?
+                """
+            async with db.execute(query, (*params, limit)) as cursor:
+                rows = await cursor.fetchall()
+        return rows[::-1] if before else rows
+
+    async def iter_participants(self, giveaway_id, batch_size=1000, after=None):
+        """
+        All participants in join order, yielded in batches of
+        (user_id, username, full_name, joined_at, is_winner) tuples.
+        Every batch is its own keyset query, so a long export holds neither
+        a pooled reader nor a read snapshot between batches.
+        after=(joined_at, user_id) starts right after that participant.
+        """
+        query = """
+            SELECT p.user_id, u.username, u.full_name, p.joined_at, p.is_winner
+            FROM participants p LEFT JOIN users u ON p.user_id = u.id
+            {where}
+            ORDER BY p.joined_at, p.user_id LIMIT ?
+        """
+        last = (after[1], None, None, after[0]) if after else None
+        while True:
+            async with self.reader() as db:
+                if last is None:
+                    where, params = "WHERE p.giveaway_id = ?", (giveaway_id,)
+                else:
+                    where, params = "WHERE p.giveaway_id = ? AND (p.joined_at, p.user_id) > (?, ?)", (giveaway_id, last[3], last[0])
+                where, params = _scoped_giveaway(where, params, "p.giveaway_id")
+                async with db.execute(query.format(where=where), (*params, batch_size)) as cursor:
+                    rows = [tuple(row) for row in await cursor.fetchall()]
+            if not rows:
+                return
+            yield rows
+            if len(rows) < batch_size:
+                return
+            last = rows[-1]
+
+    async def sample_participants(self, giveaway_id, n):
+        """
+        n random (user_id, verified) pairs in one pass over the covering index.
+        SQLite keeps only the n best random keys while scanning, so memory
+        stays O(n) however many people joined.
+        Participants who failed a re-check are left out; verified is true
+        for those who passed one within VERIFIED_MAX_AGE.
+        """
+        where, params = _scoped_giveaway("WHERE giveaway_id = ? AND eligible IS NOT 0", (VERIFIED_MAX_AGE, giveaway_id))
+        async with self.reader() as db:
+            async with db.execute(f"""
+                SELECT user_id, eligible = 1 AND verified_at >= datetime('now', ?)
+                FROM participants {where}
+                ORDER BY random() LIMIT ?
+            """, (*params, n)) as cursor:
+                return [(row[0], bool(row[1])) for row in await cursor.fetchall()]
+
+    async def get_users(self, user_ids):
+        user_ids = list(user_ids)
+        if not user_ids:
+            return []
+        placeholders = ",".join("?" * len(user_ids))
+        async with self.reader() as db:
+            async with db.execute(f"SELECT * FROM users WHERE id IN ({placeholders})", user_ids) as cursor:
+                return await cursor.fetchall()
+
     async def get_user_by_username(self, username):
         username = username.lstrip('@')
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.reader() as db:
             async with db.execute("SELECT * FROM users WHERE username = ? COLLATE NOCASE", (username,)) as cursor:
                 return await cursor.fetchone()
 
     async def finish_giveaway(self, giveaway_id):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("UPDATE giveaways SET status = 'finished' WHERE id = ?", (giveaway_id,))
+        async with self.writer() as db:
+            cursor = await db.execute(*_scoped("UPDATE giveaways SET status = 'finished' WHERE id = ?", (giveaway_id,)))
             await db.commit()
+        if not cursor.rowcount:
+            return False
+        self._drop_info(giveaway_id)
+        self._emit("giveaway_closed", giveaway_id)
+        return True
 
-    async def set_publish_message_id(self, giveaway_id, message_id):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("UPDATE giveaways SET publish_message_id = ? WHERE id = ?", (message_id, giveaway_id))
+    async def set_publish_message_id(self, giveaway_id, message_id, share_url=None):
+        async with self.writer() as db:
+            await db.execute("UPDATE giveaways SET publish_message_id = ?, share_url = ? WHERE id = ?", (message_id, share_url, giveaway_id))
             await db.commit()
+        self._update_info(giveaway_id, publish_message_id=message_id, share_url=share_url)
 
-    async def create_user(self, user_id, username, full_name):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                INSERT OR IGNORE INTO users (id, username, full_name)
-                VALUES (?, ?, ?)
-            """, (user_id, username, full_name))
-            await db.execute("""
-                UPDATE users SET username = ?, full_name = ? WHERE id = ?
-            """, (username, full_name, user_id))
+    async def set_share_url(self, giveaway_id, share_url):
+        async with self.writer() as db:
+            await db.execute("UPDATE giveaways SET share_url = ? WHERE id = ?", (share_url, giveaway_id))
             await db.commit()
+        self._update_info(giveaway_id, share_url=share_url)
+
+    async def create_user(self, user_id, username, full_name):
+        await self._enqueue(UPSERT_USER_SQL, (user_id, username, full_name))
 
     async def get_user(self, user_id):
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.reader() as db:
             async with db.execute("SELECT * FROM users WHERE id = ?", (user_id,)) as cursor:
                 return await cursor.fetchone()
 
     async def get_winners(self, giveaway_id):
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT u.* FROM participants p JOIN users u ON p.user_id = u.id WHERE p.giveaway_id = ? AND p.is_winner = 1", (giveaway_id,)) as cursor:
+        async with self.reader() as db:
+            async with db.execute(*_scoped_giveaway(
+                "SELECT u.* FROM participants p JOIN users u ON p.user_id = u.id WHERE p.giveaway_id = ? AND p.is_winner = 1",
+                (giveaway_id,), "p.giveaway_id")) as cursor:
                 return await cursor.fetchall()
             
     async def set_winner(self, user_id, giveaway_id):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("UPDATE participants SET is_winner = 1 WHERE user_id = ? AND giveaway_id = ?", (user_id, giveaway_id))
+        async with self.writer() as db:
+            cursor = await db.execute(*_scoped_giveaway(
+                "UPDATE participants SET is_winner = 1 WHERE user_id = ? AND giveaway_id = ?", (user_id, giveaway_id)))
+            await db.commit()
+        return cursor.rowcount > 0
+
+    async def set_winners(self, giveaway_id, user_ids):
+        async with self.writer() as db:
+            # Everything after the user_id placeholder is the same for each row
+            sql, params = _scoped_giveaway("UPDATE participants SET is_winner = 1 WHERE user_id = ? AND giveaway_id = ?", (giveaway_id,))
+            await db.executemany(sql, [(user_id, *params) for user_id in user_ids])
+            await db.commit()
+
+    async def save_results_snapshot(self, giveaway_id, participant_count, winners, text_html, text_alert):
+        """
+        Stores the rendered results of a finished giveaway. Snapshots are
+        immutable: the first one written for a giveaway is kept.
+        """
+        async with self.writer() as db:
+            await db.execute("""
+                INSERT OR IGNORE INTO results_snapshots (giveaway_id, participant_count, winners, text_html, text_alert)
+                VALUES (?, ?, ?, ?, ?)
+            """, (giveaway_id, participant_count, json.dumps(winners, ensure_ascii=False), text_html, text_alert))
             await db.commit()
 
+    async def get_results_snapshot(self, giveaway_id):
+        async with self.reader() as db:
+            async with db.execute(*_scoped_giveaway("SELECT * FROM results_snapshots WHERE giveaway_id = ?", (giveaway_id,))) as cursor:
+                return await cursor.fetchone()
+
     async def delete_giveaway(self, giveaway_id):
-        async with aiosqlite.connect(self.db_path) as db:
+        # False if there is no such giveaway for the bot in scope
+        async with self.writer() as db:
+            # Giveaway first, so the count trigger has no row left to update per participant
+            cursor = await db.execute(*_scoped("DELETE FROM giveaways WHERE id = ?", (giveaway_id,)))
+            if not cursor.rowcount:
+                return False
             await db.execute("DELETE FROM participants WHERE giveaway_id = ?", (giveaway_id,))
-            await db.execute("DELETE FROM giveaways WHERE id = ?", (giveaway_id,))
+            await db.execute("DELETE FROM results_snapshots WHERE giveaway_id = ?", (giveaway_id,))
+            await db.execute("DELETE FROM verification_jobs WHERE giveaway_id = ?", (giveaway_id,))
             await db.commit()
+        self._drop_info(giveaway_id)
+        self._emit("giveaway_closed", giveaway_id)
+        return True
 
     async def update_giveaway_description(self, giveaway_id, description):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("UPDATE giveaways SET description = ? WHERE id = ?", (description, giveaway_id))
+        async with self.writer() as db:
+            cursor = await db.execute(*_scoped("UPDATE giveaways SET description = ? WHERE id = ?", (description, giveaway_id)))
             await db.commit()
+        return cursor.rowcount > 0
 
-    async def add_admin_channel(self, channel_id, title):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("INSERT OR REPLACE INTO admin_channels (channel_id, title) VALUES (?, ?)", (channel_id, title))
+    async def add_admin_channel(self, channel_id, title, username=None, chat_type=None, is_admin=True):
+        async with self.writer() as db:
+            await db.execute("""
+                INSERT OR REPLACE INTO admin_channels (bot_id, channel_id, title, username, type, is_admin, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            """, (_owner(), channel_id, title, username, chat_type, int(is_admin)))
             await db.commit()
 
     async def remove_admin_channel(self, channel_id):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("DELETE FROM admin_channels WHERE channel_id = ?", (channel_id,))
+        # The row stays in the directory so the channel can still be named
+        async with self.writer() as db:
+            await db.execute(
+                "UPDATE admin_channels SET is_admin = 0, updated_at = CURRENT_TIMESTAMP WHERE bot_id = ? AND channel_id = ?",
+                (_owner(), channel_id))
             await db.commit()
 
     async def get_admin_channels(self):
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM admin_channels") as cursor:
+        async with self.reader() as db:
+            async with db.execute(*_scoped("SELECT * FROM admin_channels WHERE is_admin = 1")) as cursor:
+                return await cursor.fetchall()
+
+    async def get_channels(self, channel_ids):
+        """
+        Directory rows of the given channels: {channel_id: row}, unknown ones left out.
+        """
+        channel_ids = [ch for ch in channel_ids if isinstance(ch, int)]
+        if not channel_ids:
+            return {}
+        placeholders = ",".join("?" * len(channel_ids))
+        async with self.reader() as db:
+            async with db.execute(*_scoped(f"SELECT * FROM admin_channels WHERE channel_id IN ({placeholders})", channel_ids)) as cursor:
+                return {row['channel_id']: row for row in await cursor.fetchall()}
+
+    async def find_channel(self, channel):
+        """
+        Directory row by numeric id or @username, None if unknown.
+        """
+        async with self.reader() as db:
+            if isinstance(channel, int):
+                query, params = "SELECT * FROM admin_channels WHERE channel_id = ?", (channel,)
+            else:
+                query, params = "SELECT * FROM admin_channels WHERE username = ? COLLATE NOCASE", (channel.lstrip("@"),)
+            async with db.execute(*_scoped(query, params)) as cursor:
+                return await cursor.fetchone()
+
+    async def get_stale_channels(self, max_age):
+        # Rows not refreshed within max_age (an SQLite modifier like "-1 day")
+        async with self.reader() as db:
+            async with db.execute(
+                "SELECT * FROM admin_channels WHERE updated_at IS NULL OR updated_at < datetime('now', ?)", (max_age,)
+            ) as cursor:
+                return await cursor.fetchall()
+
+    def set_channel_member(self, channel_id, user_id, status):
+        # Not awaited by callers: a lost row only costs one get_chat_member later
+        self._enqueue_nowait(UPSERT_CHANNEL_MEMBER_SQL, (channel_id, user_id, status))
+
+    async def get_memberships(self, user_id, channel_ids, max_age, member_statuses=(), not_member_max_age=None):
+        """
+        {channel_id: status} of the user's rows updated within max_age
+        (an SQLite modifier like "-1 day"), one primary key lookup per channel.
+        Rows with a status outside member_statuses only count while younger
+        than not_member_max_age.
+        """
+        channel_ids = list(channel_ids)
+        member_statuses = list(member_statuses)
+        async with self.reader() as db:
+            async with db.execute(f"""
+                SELECT channel_id, status FROM channel_members
+                WHERE channel_id IN ({",".join("?" * len(channel_ids))}) AND user_id = ?
+                  AND updated_at >= datetime('now', CASE WHEN status IN ({",".join("?" * len(member_statuses))}) THEN ? ELSE ? END)
+            """, (*channel_ids, user_id, *member_statuses, max_age, not_member_max_age or max_age)) as cursor:
+                return {row[0]: row[1] for row in await cursor.fetchall()}
+
+    async def get_channel_names(self, channel_ids):
+        """
+        Display names of stored channels: {channel_id: username or title}.
+        Unknown channels are left out.
+        """
+        channel_ids = list(channel_ids)
+        if not channel_ids:
+            return {}
+        placeholders = ",".join("?" * len(channel_ids))
+        async with self.reader() as db:
+            async with db.execute(*_scoped(f"SELECT channel_id, title, username FROM admin_channels WHERE channel_id IN ({placeholders})", channel_ids)) as cursor:
+                return {row['channel_id']: row['username'] or row['title'] for row in await cursor.fetchall()}
+
+    # --- Subscription re-check jobs ---
+
+    async def start_verification_job(self, giveaway_id, chat_id, message_id):
+        """
+        (Re)starts the re-check of a giveaway from its first participant.
+        """
+        async with self.writer() as db:
+            cursor = await db.execute(*_scoped("""
+                INSERT OR REPLACE INTO verification_jobs (giveaway_id, status, total, chat_id, message_id)
+                SELECT id, 'running', participant_count, ?, ? FROM giveaways WHERE id = ?
+            """, (chat_id, message_id, giveaway_id)))
+            await db.commit()
+        return cursor.rowcount > 0
+
+    async def get_verification_job(self, giveaway_id):
+        async with self.reader() as db:
+            async with db.execute(*_scoped_giveaway("SELECT * FROM verification_jobs WHERE giveaway_id = ?", (giveaway_id,))) as cursor:
+                return await cursor.fetchone()
+
+    async def get_running_verification_jobs(self):
+        async with self.reader() as db:
+            async with db.execute("SELECT * FROM verification_jobs WHERE status = 'running'") as cursor:
                 return await cursor.fetchall()
 
-db = Database()
+    async def save_verification_batch(self, giveaway_id, verdicts, cursor, checked, eligible, failed):
+        """
+        Stores the verdicts of one batch, [(user_id, eligible)], and moves
+        the job cursor past it in the same transaction.
+        """
+        async with self.writer() as db:
+            await db.executemany(
+                "UPDATE participants SET eligible = ?, verified_at = CURRENT_TIMESTAMP WHERE user_id = ? AND giveaway_id = ?",
+                [(int(ok), user_id, giveaway_id) for user_id, ok in verdicts]
+            )
+            await db.execute("""
+                UPDATE verification_jobs
+                SET cursor_joined_at = ?, cursor_user_id = ?, checked = ?, eligible = ?, failed = ?,
+                    total = (SELECT participant_count FROM giveaways WHERE id = ?), updated_at = CURRENT_TIMESTAMP
+                WHERE giveaway_id = ?
+            """, (*cursor, checked, eligible, failed, giveaway_id, giveaway_id))
+            await db.commit()
+
+    async def finish_verification_job(self, giveaway_id, status="done"):
+        async with self.writer() as db:
+            await db.execute("UPDATE verification_jobs SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE giveaway_id = ?", (status, giveaway_id))
+            await db.commit()
+
+db = Database(DB_PATH)
@@ -0,0 +1,47 @@
+from dataclasses import dataclass, replace
+from typing import Optional
+
+def parse_channel_ids(channel_ids: str) -> list:
+    """
+    Splits the comma-separated giveaways.channel_ids column, numeric ids as int.
+    """
+    result = []
+    for channel in channel_ids.split(','):
+        channel = channel.strip()
+        if not channel: continue
+        try:
+            result.append(int(channel))
+        except ValueError:
+            result.append(channel)
+    return result
+
+@dataclass(frozen=True, slots=True)
+class GiveawayInfo:
+    """
+    The part of an active giveaway that taps and counter edits need,
+    with channel_ids already parsed. Kept in memory by Database.
+    """
+    id: int
+    channel_ids: tuple
+    button_text: str
+    publish_channel_id: Optional[int]
+    publish_message_id: Optional[int]
+    share_url: Optional[str]
+    status: str
+    bot_id: int
+
+    @classmethod
+    def from_row(cls, row) -> "GiveawayInfo":
+        return cls(
+            id=row['id'],
+            channel_ids=tuple(parse_channel_ids(row['channel_ids'] or "")),
+            button_text=row['button_text'],
+            publish_channel_id=row['publish_channel_id'],
+            publish_message_id=row['publish_message_id'],
+            share_url=row['share_url'],
+            status=row['status'],
+            bot_id=row['bot_id'],
+        )
+
+    def updated(self, **changes) -> "GiveawayInfo":
+        return replace(self, **changes)
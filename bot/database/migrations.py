@@ -0,0 +1,293 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Every schema change is a numbered step that runs exactly once.
+# Add new steps to the end of MIGRATIONS, never edit or reorder old ones.
+
+async def _column_names(db, table):
+    async with db.execute(f"PRAGMA table_info({table})") as cursor:
+        return {row[1] for row in await cursor.fetchall()}
+
+async def _add_column(db, table, column, definition):
+    if column not in await _column_names(db, table):
+        await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+async def _initial_schema(db):
+    # Users table
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY,
+            username TEXT,
+            full_name TEXT,
+            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Giveaways table
+    # status: active, finished
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS giveaways (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel_ids TEXT,
+            description TEXT,
+            media_id TEXT,
+            media_type TEXT,
+            button_text TEXT,
+            publish_channel_id INTEGER,
+            publish_message_id INTEGER,
+            end_time TIMESTAMP,
+            status TEXT DEFAULT 'active',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Participants table
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS participants (
+            user_id INTEGER,
+            giveaway_id INTEGER,
+            is_winner BOOLEAN DEFAULT 0,
+            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, giveaway_id),
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            FOREIGN KEY (giveaway_id) REFERENCES giveaways(id)
+        )
+    """)
+
+    # Admin Channels table
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS admin_channels (
+            channel_id INTEGER PRIMARY KEY,
+            title TEXT
+        )
+    """)
+
+    # Databases created before versioning may miss these columns
+    await _add_column(db, "giveaways", "publish_channel_id", "INTEGER")
+    await _add_column(db, "giveaways", "publish_message_id", "INTEGER")
+    await _add_column(db, "participants", "is_winner", "BOOLEAN DEFAULT 0")
+
+async def _hot_query_indexes(db):
+    # get_active_giveaways
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_giveaways_status ON giveaways (status)")
+    # get_user_by_username
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_users_username ON users (username COLLATE NOCASE)")
+    # Per-giveaway participant lists and counts, ordered like the admin browser.
+    # The primary key starts with user_id so it can't serve these.
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_participants_giveaway ON participants (giveaway_id, joined_at, user_id)")
+    # get_winners
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_participants_winners ON participants (giveaway_id) WHERE is_winner = 1")
+
+async def _channel_usernames(db):
+    # Lets handlers print channel names without calling get_chat
+    await _add_column(db, "admin_channels", "username", "TEXT")
+
+async def _giveaway_share_url(db):
+    # Computed once at publish time instead of on every counter edit
+    await _add_column(db, "giveaways", "share_url", "TEXT")
+
+async def _participant_count(db):
+    # Kept exact by triggers, so no COUNT(*) is needed to show a counter.
+    # INSERT OR IGNORE skips the trigger for duplicates.
+    await _add_column(db, "giveaways", "participant_count", "INTEGER NOT NULL DEFAULT 0")
+    await db.execute("""
+        UPDATE giveaways
+        SET participant_count = (SELECT COUNT(*) FROM participants WHERE participants.giveaway_id = giveaways.id)
+    """)
+    await db.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_participants_count_insert AFTER INSERT ON participants
+        BEGIN
+            UPDATE giveaways SET participant_count = participant_count + 1 WHERE id = NEW.giveaway_id;
+        END
+    """)
+    await db.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_participants_count_delete AFTER DELETE ON participants
+        BEGIN
+            UPDATE giveaways SET participant_count = participant_count - 1 WHERE id = OLD.giveaway_id;
+        END
+    """)
+
+async def _results_snapshots(db):
+    # Rendered once by publish_results, every results view is a key lookup
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS results_snapshots (
+            giveaway_id INTEGER PRIMARY KEY,
+            participant_count INTEGER,
+            winners TEXT,
+            text_html TEXT,
+            text_alert TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Finished giveaways get the snapshot they would have got when finished,
+    # from the winners marked in participants. Imported here because
+    # bot.results itself imports the database.
+    from bot.results import render_results, winner_name
+    async with db.execute("""
+        SELECT g.id, g.participant_count, p.user_id, u.username, u.full_name
+        FROM giveaways g
+        LEFT JOIN participants p ON p.giveaway_id = g.id AND p.is_winner = 1
+        LEFT JOIN users u ON u.id = p.user_id
+        WHERE g.status = 'finished'
+        ORDER BY g.id, p.joined_at, p.user_id
+    """) as cursor:
+        rows = await cursor.fetchall()
+    giveaways = {}
+    for giveaway_id, participant_count, user_id, username, full_name in rows:
+        _, winners = giveaways.setdefault(giveaway_id, (participant_count, []))
+        if user_id is not None:
+            winners.append(winner_name({"username": username, "full_name": full_name or str(user_id)}))
+    for giveaway_id, (participant_count, winners) in giveaways.items():
+        texts = render_results(giveaway_id, participant_count, winners)
+        await db.execute("""
+            INSERT OR IGNORE INTO results_snapshots (giveaway_id, participant_count, winners, text_html, text_alert)
+            VALUES (?, ?, ?, ?, ?)
+        """, (giveaway_id, participant_count, json.dumps(winners, ensure_ascii=False), texts["html"], texts["alert"]))
+
+async def _participant_verification(db):
+    # Result of the last subscription re-check: eligible NULL = never
+    # checked, 0 = was missing a channel, 1 = subscribed at verified_at
+    await _add_column(db, "participants", "verified_at", "TIMESTAMP")
+    await _add_column(db, "participants", "eligible", "INTEGER")
+    # Covers draw sampling, which skips eligible = 0
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_participants_eligibility
+        ON participants (giveaway_id, eligible, user_id, verified_at)
+    """)
+    # One re-check job per giveaway. The keyset cursor (joined_at, user_id)
+    # of the last saved batch is where a job resumes after a restart.
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS verification_jobs (
+            giveaway_id INTEGER PRIMARY KEY,
+            status TEXT NOT NULL DEFAULT 'running',
+            cursor_joined_at TIMESTAMP,
+            cursor_user_id INTEGER,
+            total INTEGER NOT NULL DEFAULT 0,
+            checked INTEGER NOT NULL DEFAULT 0,
+            eligible INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            chat_id INTEGER,
+            message_id INTEGER,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+async def _giveaway_schedule(db):
+    # end_time (UTC) is when the scheduler draws winners_count winners
+    # and publishes the results
+    await _add_column(db, "giveaways", "winners_count", "INTEGER NOT NULL DEFAULT 1")
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_giveaways_end_time
+        ON giveaways (end_time) WHERE status = 'active' AND end_time IS NOT NULL
+    """)
+
+async def _channel_members(db):
+    # Membership of users in required channels, from chat_member updates and
+    # get_chat_member answers, so most subscription checks need no API call
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS channel_members (
+            channel_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (channel_id, user_id)
+        ) WITHOUT ROWID
+    """)
+
+async def _channel_directory(db):
+    # admin_channels becomes a directory of every channel the bot has
+    # seen. Rows stay when the bot loses admin rights (is_admin = 0), so
+    # posts can still name the channel. updated_at drives the refresh sweep.
+    await _add_column(db, "admin_channels", "type", "TEXT")
+    await _add_column(db, "admin_channels", "is_admin", "INTEGER NOT NULL DEFAULT 1")
+    await _add_column(db, "admin_channels", "updated_at", "TIMESTAMP")
+    # find_channel by @username
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_admin_channels_username ON admin_channels (username COLLATE NOCASE)")
+
+async def _bot_ids(db):
+    # Several bots can share the database. Giveaway ids are unique across
+    # bots, so participants, results and jobs are kept apart through them;
+    # giveaways and the channel directory carry their bot. bot_id 0 marks
+    # rows from before, Database.adopt_rows hands them to the first bot.
+    await _add_column(db, "giveaways", "bot_id", "INTEGER NOT NULL DEFAULT 0")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_giveaways_bot ON giveaways (bot_id, status)")
+    # Whether the bot is an admin differs per bot, the key gets bot_id
+    await db.execute("""
+        CREATE TABLE admin_channels_new (
+            bot_id INTEGER NOT NULL DEFAULT 0,
+            channel_id INTEGER NOT NULL,
+            title TEXT,
+            username TEXT,
+            type TEXT,
+            is_admin INTEGER NOT NULL DEFAULT 1,
+            updated_at TIMESTAMP,
+            PRIMARY KEY (bot_id, channel_id)
+        )
+    """)
+    await db.execute("""
+        INSERT INTO admin_channels_new (channel_id, title, username, type, is_admin, updated_at)
+        SELECT channel_id, title, username, type, is_admin, updated_at FROM admin_channels
+    """)
+    await db.execute("DROP TABLE admin_channels")
+    await db.execute("ALTER TABLE admin_channels_new RENAME TO admin_channels")
+    await db.execute("CREATE INDEX idx_admin_channels_username ON admin_channels (username COLLATE NOCASE)")
+
+MIGRATIONS = [
+    (1, _initial_schema),
+    (2, _hot_query_indexes),
+    (3, _channel_usernames),
+    (4, _giveaway_share_url),
+    (5, _participant_count),
+    (6, _results_snapshots),
+    (7, _participant_verification),
+    (8, _giveaway_schedule),
+    (9, _channel_members),
+    (10, _channel_directory),
+    (11, _bot_ids),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+async def get_schema_version(db):
+    async with db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'") as cursor:
+        if not await cursor.fetchone():
+            return 0
+    async with db.execute("SELECT MAX(version) FROM schema_version") as cursor:
+        return (await cursor.fetchone())[0] or 0
+
+async def run_migrations(db):
+    """
+    Brings the schema up to LATEST_VERSION, one transaction per step.
+    Does no DDL at all when the database is already current.
+    """
+    version = await get_schema_version(db)
+    if version >= LATEST_VERSION:
+        return version
+
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    await db.commit()
+
+    for step_version, step in MIGRATIONS:
+        if step_version <= version:
+            continue
+        await db.execute("BEGIN")
+        try:
+            await step(db)
+            await db.execute("INSERT INTO schema_version (version) VALUES (?)", (step_version,))
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        logger.info("Applied migration %s: %s", step_version, step.__name__)
+        version = step_version
+
+    return version
@@ -0,0 +1,62 @@
+import asyncio
+import logging
+
+from aiogram import Bot
+
+from bot.database.core import db
+from bot.database.giveaways import parse_channel_ids
+from bot.utils import check_subscriptions
+
+logger = logging.getLogger(__name__)
+
+async def draw_winners(bot: Bot, giveaway, k: int = 1, oversample: int = 3, max_rounds: int = 6):
+    """
+    Picks k random participants who are still subscribed to every required
+    channel and marks them as winners.
+
+    Candidates are sampled in SQL (never the whole list), k * oversample at
+    a time, and verified concurrently in small chunks until k have passed.
+    If the sample runs out, the next one is twice as large. Existing winners
+    and participants who failed a re-check (bot/verification.py) are
+    skipped; those who passed a recent one are taken without asking
+    Telegram again.
+    Returns the new winners as user rows, fewer than k if the pool ran out.
+    """
+    giveaway_id = giveaway['id']
+    channels = parse_channel_ids(giveaway['channel_ids'])
+
+    seen = {w['id'] for w in await db.get_winners(giveaway_id)}
+    winner_ids = []
+    sample_size = k * oversample + len(seen)
+
+    for _ in range(max_rounds):
+        sample = await db.sample_participants(giveaway_id, sample_size)
+        candidates = [(user_id, verified) for user_id, verified in sample if user_id not in seen]
+        seen.update(user_id for user_id, _ in candidates)
+
+        while candidates and len(winner_ids) < k:
+            # Verify about twice as many as still needed at once
+            chunk_size = max(2 * (k - len(winner_ids)), 10)
+            chunk, candidates = candidates[:chunk_size], candidates[chunk_size:]
+            to_check = [user_id for user_id, verified in chunk if not verified]
+            results = dict(zip(to_check, await asyncio.gather(*(check_subscriptions(bot, user_id, channels) for user_id in to_check))))
+            for user_id, verified in chunk:
+                not_subscribed, unverified = results.get(user_id, ([], []))
+                if unverified:
+                    seen.discard(user_id) # Telegram was slow, may be sampled again
+                elif not not_subscribed and len(winner_ids) < k:
+                    winner_ids.append(user_id)
+
+        # A short sample means every participant has been looked at
+        if len(winner_ids) == k or len(sample) < sample_size:
+            break
+        sample_size *= 2
+
+    if not winner_ids:
+        return []
+
+    await db.set_winners(giveaway_id, winner_ids)
+    logger.info("Drew %s/%s winners for giveaway #%s", len(winner_ids), k, giveaway_id)
+
+    users = {u['id']: u for u in await db.get_users(winner_ids)}
+    return [users[user_id] for user_id in winner_ids if user_id in users]
@@ -0,0 +1,112 @@
+import asyncio
+import csv
+import gzip
+import json
+import logging
+import os
+import tempfile
+import time
+
+from aiogram import Bot
+from aiogram.types import FSInputFile
+
+from bot.database.core import db
+from bot.ratelimit import background
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("csv", "jsonl")
+EXPORT_COLUMNS = ("user_id", "username", "full_name", "joined_at", "is_winner")
+EXPORT_BATCH = 2000
+PROGRESS_INTERVAL = 3.0
+# Bot API upload limit for documents
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+
+# giveaway_id -> running export task, one export per giveaway at a time
+_exports = {}
+
+def _open_gzip(path):
+    return gzip.open(path, "wt", encoding="utf-8", newline="", compresslevel=6)
+
+def _write_csv(file, rows, header=False):
+    writer = csv.writer(file)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows((user_id, username or "", full_name or "", joined_at or "", int(bool(is_winner)))
+                     for user_id, username, full_name, joined_at, is_winner in rows)
+
+def _write_jsonl(file, rows, header=False):
+    file.writelines(json.dumps(dict(zip(EXPORT_COLUMNS, (*row[:4], bool(row[4])))), ensure_ascii=False) + "\n"
+                    for row in rows)
+
+WRITERS = {"csv": _write_csv, "jsonl": _write_jsonl}
+
+def is_export_running(giveaway_id) -> bool:
+    task = _exports.get(giveaway_id)
+    return task is not None and not task.done()
+
+def start_export(bot: Bot, giveaway_id, fmt, chat_id, progress_message_id):
+    """
+    Runs the export as a background task and returns it.
+    """
+    task = asyncio.create_task(export_participants(bot, giveaway_id, fmt, chat_id, progress_message_id))
+    _exports[giveaway_id] = task
+    task.add_done_callback(lambda _: _exports.pop(giveaway_id, None))
+    return task
+
+async def export_participants(bot: Bot, giveaway_id, fmt, chat_id, progress_message_id):
+    """
+    Streams the participants of a giveaway into a gzip-compressed CSV or
+    JSONL file and sends it to chat_id as a document.
+
+    Rows are read in keyset batches and compressed in a worker thread, so
+    memory stays flat and the event loop only waits on the database.
+    """
+    write = WRITERS[fmt]
+    total = await db.get_participants_count(giveaway_id)
+    fd, path = tempfile.mkstemp(prefix=f"giveaway_{giveaway_id}_", suffix=f".{fmt}.gz")
+    os.close(fd)
+
+    async def progress(text):
+        try:
+            await bot.edit_message_text(text, chat_id=chat_id, message_id=progress_message_id)
+        except Exception as e:
+            logger.debug("Export progress edit failed: %s", e)
+
+    # Upload and progress edits must not hold up users tapping buttons
+    with background():
+        try:
+            file = await asyncio.to_thread(_open_gzip, path)
+            written = 0
+            last_progress = time.monotonic()
+            try:
+                async for rows in db.iter_participants(giveaway_id, EXPORT_BATCH):
+                    await asyncio.to_thread(write, file, rows, written == 0)
+                    written += len(rows)
+                    if time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                        last_progress = time.monotonic()
+                        await progress(f"📤 Выгрузка участников #{giveaway_id}: {written} из {total}"
+                                       f" ({100 * written // max(total, 1)}%)")
+                if written == 0 and fmt == "csv":
+                    await asyncio.to_thread(write, file, [], True)
+            finally:
+                await asyncio.to_thread(file.close)
+
+            size = os.path.getsize(path)
+            if size > MAX_UPLOAD_BYTES:
+                await progress(f"⚠️ Файл выгрузки слишком большой для Telegram ({size // (1024 * 1024)} МБ).")
+                return
+
+            await progress(f"📤 Выгрузка участников #{giveaway_id}: {written} строк, отправляю файл...")
+            await bot.send_document(
+                chat_id,
+                FSInputFile(path, filename=f"giveaway_{giveaway_id}_participants.{fmt}.gz"),
+                caption=f"👥 Участники розыгрыша #{giveaway_id}: {written}",
+            )
+            await progress(f"✅ Выгрузка участников #{giveaway_id} готова: {written} строк.")
+            logger.info("Exported %s participants of giveaway #%s as %s (%s bytes)", written, giveaway_id, fmt, size)
+        except Exception as e:
+            logger.exception("Export of giveaway #%s failed", giveaway_id)
+            await progress(f"❌ Ошибка выгрузки: {e}")
+        finally:
+            os.remove(path)
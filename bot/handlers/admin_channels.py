@@ -1,13 +1,17 @@
+import logging
 from aiogram import Router, F, types
 from aiogram.enums import ChatMemberStatus
 from bot.database.core import db
+from bot.utils import remember_membership
 
+logger = logging.getLogger(__name__)
 router = Router()
 
 @router.my_chat_member()
 async def on_my_chat_member(event: types.ChatMemberUpdated):
     """
-    Updates the list of channels where the bot is an admin.
+    Keeps the channel directory current: title, username, type and
+    whether the bot is an admin there.
     """
     new_status = event.new_chat_member.status
     old_status = event.old_chat_member.status
@@ -21,16 +25,18 @@ async def on_my_chat_member(event: types.ChatMemberUpdated):
     is_admin = new_status in [ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.CREATOR]
     was_admin = old_status in [ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.CREATOR]
 
+    # The row is kept either way, so posts can still name the channel
+    await db.add_admin_channel(chat.id, chat.title, chat.username, chat.type, is_admin)
+
     if is_admin and not was_admin:
-        # Bot became admin
-        await db.add_admin_channel(chat.id, chat.title)
-        print(f"DEBUG: Added admin channel {chat.title} ({chat.id})")
-        
+        logger.info("Added admin channel %s (%s)", chat.title, chat.id)
     elif not is_admin and was_admin:
-        # Bot lost admin rights
-        await db.remove_admin_channel(chat.id)
-        print(f"DEBUG: Removed admin channel {chat.title} ({chat.id})")
-    
-    # Also update if it was admin and still admin (e.g. title changed or perms changed)
-    elif is_admin and was_admin:
-         await db.add_admin_channel(chat.id, chat.title)
+        logger.info("Removed admin channel %s (%s)", chat.title, chat.id)
+
+@router.chat_member()
+async def on_chat_member(event: types.ChatMemberUpdated):
+    """
+    Someone joined or left a channel: the new status replaces the cached
+    one and is stored, so the next check of this user needs no API call.
+    """
+    remember_membership(event.new_chat_member.user.id, event.chat.id, event.new_chat_member.status)
@@ -1,14 +1,21 @@
+import logging
 from aiogram import Router, F, types, Bot
 from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from bot.states import GiveawayCreation
 from bot.keyboards.admin import main_admin_keyboard, cancel_keyboard, confirmation_keyboard
+from bot.keyboards.giveaway import giveaway_post_keyboard
+from bot.utils import build_share_url, parse_end_time, format_end_time, MAX_WINNERS
+from bot.results import get_results
+from bot.channels import channel_titles, resolve_channel, subscribe_text
 from bot.database.core import db
 from bot.config import ADMIN_IDS
 
+logger = logging.getLogger(__name__)
 router = Router()
 
+NO_END_TIME = "⏳ Без срока"
+
 # Filter for admin functionality
 router.message.filter(F.from_user.id.in_(ADMIN_IDS))
 
@@ -18,45 +25,14 @@ async def cmd_start(message: types.Message, command: CommandObject):
     if args and args.startswith("res_"):
         try:
             giveaway_id = int(args.split("_")[1])
+            results = await get_results(giveaway_id)
             
-            # Check hardcoded winners first
-            from bot.handlers.user import HARDCODED_WINNERS
-            if giveaway_id in HARDCODED_WINNERS:
-                winners_text = "Победители:\n" + "\n".join(HARDCODED_WINNERS[giveaway_id])
-                text = (
-                    f"📊 <b>ИТОГИ РОЗЫГРЫША #{giveaway_id}</b>\n\n"
-                    f"🏆 <b>{winners_text}</b>\n\n"
-                    f"🔒 <i>Все победители были выбраны случайным образом (рандомайзером).</i>"
-                )
-                await message.answer(text, parse_mode="HTML")
-                await message.answer("🪐 Привет, Админ! Готов к запуску розыгрышей?", reply_markup=main_admin_keyboard())
-                return
-            
-            giveaway = await db.get_giveaway(giveaway_id)
-            
-            if giveaway:
-                participants_count = await db.get_participants_count(giveaway_id)
-                winners = await db.get_winners(giveaway_id)
-                
-                winners_names = [f"@{w['username']}" if w['username'] else w['full_name'] for w in winners]
-                
-                if not winners:
-                    winners_text = "Победители еще не определены."
-                else:
-                    winners_text = "Победители:\n" + "\n".join([f"🥇 {name}" for name in winners_names])
-                    
-                text = (
-                    f"📊 <b>ИТОГИ РОЗЫГРЫША #{giveaway_id}</b>\n\n"
-                    f"👥 Всего участников: {participants_count}\n"
-                    f"🏆 <b>{winners_text}</b>\n\n"
-                    f"🔒 <i>Все победители были выбраны случайным образом (рандомайзером).</i>"
-                )
-                
-                await message.answer(text, parse_mode="HTML")
+            if results:
+                await message.answer(results["html"], parse_mode="HTML")
             else:
                 await message.answer("Розыгрыш не найден.")
-        except Exception as e:
-            print(f"ERROR admin deep link result: {e}")
+        except Exception:
+            logger.exception("Failed to show results for deep link %r", args)
             await message.answer("Ошибка при загрузке результатов.")
             
     await message.answer("🪐 Привет, Админ! Готов к запуску розыгрышей?", reply_markup=main_admin_keyboard())
@@ -105,25 +81,22 @@ async def process_channels(message: types.Message, state: FSMContext, bot: Bot):
     valid_channels = []
     failed_channels = []
     
-    from bot.utils import prepare_channel_id, is_bot_admin
-    
     msg = await message.answer("🔍 Проверяю каналы...")
     
     for input_channel in raw_channels:
         if not input_channel: continue
         
-        print(f"DEBUG: Check loop for '{input_channel}'")
-        chat_id, chat = await prepare_channel_id(bot, input_channel)
-        
-        if not chat_id:
+        # Known channels come from the directory, new ones are stored in it
+        chat_id, error = await resolve_channel(bot, input_channel)
+
+        if error == "not_found":
             failed_channels.append(f"{input_channel} (не найден)")
             continue
-            
-        print(f"DEBUG: Checking admin rights for {chat_id}")
-        if not await is_bot_admin(bot, chat_id):
+
+        if error == "not_admin":
             failed_channels.append(f"{input_channel} (бот не админ)")
             continue
-            
+
         valid_channels.append(str(chat_id))
 
     if failed_channels:
@@ -159,43 +132,78 @@ async def process_button_text(message: types.Message, state: FSMContext):
 async def process_publish_channel(message: types.Message, state: FSMContext, bot: Bot):
     channel_input = message.text
     
-    from bot.utils import prepare_channel_id, is_bot_admin
-
     # Extract ID if selected from menu: "Title (ID: -123)"
     if "(ID: " in channel_input and channel_input.endswith(")"):
         channel_input = channel_input.split("(ID: ")[1][:-1]
     
     # Verify access
-    chat_id, chat = await prepare_channel_id(bot, channel_input)
-    
-    if not chat_id:
+    chat_id, error = await resolve_channel(bot, channel_input)
+
+    if error == "not_found":
         await message.answer("❌ Не могу найти этот канал. Убедитесь, что ссылка, юзернейм или ID верные.")
         return
-        
-    if not await is_bot_admin(bot, chat_id):
+
+    if error == "not_admin":
         await message.answer("❌ Я не администратор в этом канале! Выдайте мне права администратора.")
         return
         
     channel_id = chat_id
 
     await state.update_data(publish_channel_id=channel_id)
-    
+
+    kb = types.ReplyKeyboardMarkup(keyboard=[
+        [types.KeyboardButton(text=NO_END_TIME)],
+        [types.KeyboardButton(text="❌ Отмена")],
+    ], resize_keyboard=True)
+    await state.set_state(GiveawayCreation.waiting_for_end_time)
+    await message.answer(
+        "⏰ Когда подвести итоги? Введи дату и время (например, <code>25.12.2026 18:00</code>) "
+        "или длительность (<code>3d</code>, <code>12h</code>, <code>1d 6h</code>).\n"
+        "В это время бот сам выберет победителей и опубликует результаты.",
+        reply_markup=kb
+    )
+
+@router.message(GiveawayCreation.waiting_for_end_time)
+async def process_end_time(message: types.Message, state: FSMContext, bot: Bot):
+    text = message.text or ""
+    if text == NO_END_TIME or text.lower() == 'skip':
+        await state.update_data(end_time=None, winners_count=1)
+        await send_preview(message, state, bot)
+        return
+
+    end_time = parse_end_time(text)
+    if not end_time:
+        await message.answer("❌ Не понял время. Нужна дата в будущем: <code>25.12.2026 18:00</code> или <code>3d</code>.")
+        return
+
+    await state.update_data(end_time=end_time)
+    await state.set_state(GiveawayCreation.waiting_for_winners_count)
+    await message.answer(f"🏆 Сколько победителей выбрать? (от 1 до {MAX_WINNERS})", reply_markup=cancel_keyboard())
+
+@router.message(GiveawayCreation.waiting_for_winners_count)
+async def process_winners_count(message: types.Message, state: FSMContext, bot: Bot):
+    text = (message.text or "").strip()
+    if not text.isdigit() or not 1 <= int(text) <= MAX_WINNERS:
+        await message.answer(f"❌ Введи число от 1 до {MAX_WINNERS}.")
+        return
+
+    await state.update_data(winners_count=int(text))
+    await send_preview(message, state, bot)
+
+async def send_preview(message: types.Message, state: FSMContext, bot: Bot):
     data = await state.get_data()
+    channel_id = data['publish_channel_id']
     
     # Render preview
-    channel_display = []
-    for cid in data['channels']:
-        try:
-             chat = await bot.get_chat(cid)
-             channel_display.append(f"{chat.title}")
-        except:
-             channel_display.append(cid)
+    channel_display = await channel_titles([int(cid) for cid in data['channels']])
 
     preview_text = (
         f"<b>Предпросмотр розыгрыша:</b>\n\n{data['description']}\n\n"
         f"📝 Условия: Подписка на:\n" + "\n".join(channel_display) + "\n"
         f"📢 Публикация в: {channel_id}"
     )
+    if data.get('end_time'):
+        preview_text += f"\n⏰ Итоги: {format_end_time(data['end_time'])}, победителей: {data['winners_count']}"
     
     kb = confirmation_keyboard()
     
@@ -218,42 +226,26 @@ async def process_publish_channel(message: types.Message, state: FSMContext, bot
 async def publish_giveaway(callback: types.CallbackQuery, state: FSMContext, bot: Bot):
     data = await state.get_data()
     
-    # Save to DB
+    # Save to DB. The end time is set once the post exists, so a failed
+    # publication is never finished by the scheduler.
     giveaway_id = await db.create_giveaway(
         description=data['description'],
         channel_ids=",".join(data['channels']),
         media_id=data.get('media_id'),
         media_type=data.get('media_type'),
         button_text=data.get('button_text', "Участвую"),
-        publish_channel_id=data['publish_channel_id']
+        publish_channel_id=data['publish_channel_id'],
+        winners_count=data.get('winners_count', 1)
     )
     
     # Construct keyboard
-    base_btn_text = data.get('button_text', 'Участвую')
-    button_txt_with_count = f"{base_btn_text} (0)"
-    
-    kb = InlineKeyboardMarkup(inline_keyboard=[[
-        InlineKeyboardButton(text=button_txt_with_count, callback_data=f"participate_{giveaway_id}")
-    ]])
+    kb = giveaway_post_keyboard(giveaway_id, data.get('button_text', 'Участвую'), 0)
 
     # Publish
+    msg = None
     try:
         # Append channel list
-        lines = []
-        for cid in data['channels']:
-             try:
-                 chat = await bot.get_chat(cid)
-                 link = chat.username
-                 name = chat.title
-                 if link:
-                     lines.append(f"👉 <a href='https://t.me/{link}'>{name}</a>")
-                 else:
-                     lines.append(f"👉 {name}")
-             except:
-                 lines.append(f"👉 Канал {cid}")
-
-        channels_text = "\n\n📢 <b>Подпишись на:</b>\n" + "\n".join(lines)
-        final_text = data['description'] + channels_text
+        final_text = data['description'] + await subscribe_text([int(cid) for cid in data['channels']])
         
         if data.get('media_type') == 'photo':
             msg = await bot.send_photo(chat_id=data['publish_channel_id'], photo=data['media_id'], caption=final_text, reply_markup=kb)
@@ -262,29 +254,30 @@ async def publish_giveaway(callback: types.CallbackQuery, state: FSMContext, bot
         else:
             msg = await bot.send_message(chat_id=data['publish_channel_id'], text=final_text, reply_markup=kb)
         
-        await db.set_publish_message_id(giveaway_id, msg.message_id)
-        
-        # Add a share button so users can share the post (since Telegram removes buttons on forward)
+        # Add a share button so users can share the post (since Telegram removes buttons on forward).
+        # The link is stored with the giveaway so later edits reuse it.
+        share_url = None
         try:
-            chat = await bot.get_chat(data['publish_channel_id'])
-            if chat.username:
-                post_url = f"https://t.me/{chat.username}/{msg.message_id}"
-            else:
-                post_url = f"https://t.me/c/{str(chat.id)[4:]}/{msg.message_id}"
-                
-            share_url = f"https://t.me/share/url?url={post_url}&text=Участвуй в конкурсе! 🎁"
-            
-            kb_with_share = InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text=data.get('button_text', "Участвую"), callback_data=f"participate_{giveaway_id}")],
-                [InlineKeyboardButton(text="🔗 Поделиться", url=share_url)]
-            ])
+            channel = await db.find_channel(data['publish_channel_id'])
+            share_url = build_share_url(data['publish_channel_id'], channel['username'] if channel else None, msg.message_id)
+            kb_with_share = giveaway_post_keyboard(giveaway_id, data.get('button_text', "Участвую"), 0, share_url)
             await bot.edit_message_reply_markup(chat_id=data['publish_channel_id'], message_id=msg.message_id, reply_markup=kb_with_share)
         except Exception as e:
-            print(f"Failed to add share button: {e}")
-        
+            logger.warning("Failed to add share button to giveaway #%s: %s", giveaway_id, e)
+
+        await db.set_publish_message_id(giveaway_id, msg.message_id, share_url)
+        if data.get('end_time'):
+            await db.set_end_time(giveaway_id, data['end_time'])
+
         await callback.message.edit_reply_markup(reply_markup=None) 
-        await callback.message.answer(f"✅ Розыгрыш #{giveaway_id} опубликован!\n(Добавлена кнопка 'Поделиться' для удобного репоста)", reply_markup=main_admin_keyboard())
+        text = f"✅ Розыгрыш #{giveaway_id} опубликован!\n(Добавлена кнопка 'Поделиться' для удобного репоста)"
+        if data.get('end_time'):
+            text += f"\n⏰ Итоги будут подведены автоматически {format_end_time(data['end_time'])}."
+        await callback.message.answer(text, reply_markup=main_admin_keyboard())
     except Exception as e:
+        if msg is None:
+            # Nothing was posted, the giveaway would only be a dead row
+            await db.delete_giveaway(giveaway_id)
         await callback.message.answer(f"⚠️ Ошибка публикации: {e}", reply_markup=main_admin_keyboard())
 
     await state.clear()
@@ -1,4 +1,5 @@
 
+import logging
 from aiogram import Router, F, types, Bot
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
@@ -7,9 +8,16 @@ from bot.database.core import db
 from bot.config import ADMIN_IDS
 from bot.keyboards.admin import main_admin_keyboard
 from aiogram.fsm.state import State, StatesGroup
-import random
-from bot.utils import get_message_html, check_subscription
-
+from bot.database.giveaways import parse_channel_ids
+from bot.utils import get_message_html, resolve_share_url, parse_end_time, format_end_time, MAX_WINNERS
+from bot.channels import subscribe_text
+from bot.keyboards.giveaway import giveaway_post_keyboard
+from bot.draw import draw_winners
+from bot.results import announce_results
+from bot.export import EXPORT_FORMATS, is_export_running, start_export
+from bot.verification import verification_jobs, progress_text
+
+logger = logging.getLogger(__name__)
 router = Router()
 router.message.filter(F.from_user.id.in_(ADMIN_IDS))
 
@@ -19,9 +27,7 @@ async def get_giveaway_keyboard(action_prefix: str):
     kb = InlineKeyboardMarkup(inline_keyboard=[])
     rows = []
     for g in giveaways:
-        # Get participant count
-        participants = await db.get_participants(g['id'])
-        count = len(participants)
+        count = g['participant_count']
         # Button text: ID | Description snippet | Count
         desc = g['description'][:15] + "..." if len(g['description']) > 15 else g['description']
         rows.append([InlineKeyboardButton(text=f"#{g['id']} {desc} ({count} уч.)", callback_data=f"{action_prefix}_{g['id']}")])
@@ -46,7 +52,6 @@ async def view_giveaway_info(callback: types.CallbackQuery):
         await callback.answer("Розыгрыш не найден", show_alert=True)
         return
 
-    participants = await db.get_participants(gw_id)
     winners = await db.get_winners(gw_id)
     
     # Construct info text
@@ -54,10 +59,12 @@ async def view_giveaway_info(callback: types.CallbackQuery):
         f"🎁 <b>Розыгрыш #{gw_id}</b>\n"
         f"📄 Описание: {gw['description']}\n"
         f"📢 Публикация в: {gw['publish_channel_id']}\n"
-        f"👥 Участников: {len(participants)}\n"
+        f"👥 Участников: {gw['participant_count']}\n"
         f"🏆 Победителей выбрано: {len(winners)}\n"
         f"🏁 Статус: {gw['status']}"
     )
+    if gw['end_time']:
+        text += f"\n⏰ Итоги: {format_end_time(gw['end_time'])}, победителей: {gw['winners_count']}"
     
     # Button to go back to list or maybe manage directly?
     # User separated "List" and "Manage". So here just info.
@@ -85,35 +92,74 @@ async def list_participants_menu(message: types.Message):
     else:
         await message.answer("👥 Выбери розыгрыш для просмотра участников и выбора победителя:", reply_markup=kb)
 
-async def render_participant_page(callback: types.CallbackQuery, gw_id: int, page: int):
+PARTICIPANTS_PER_PAGE = 25
+
+def parse_page_cursor(token):
+    """
+    Page cursor from callback data: "n<user_id>" = page starting at that
+    participant, "p<user_id>" = page ending right before them.
+    """
+    if not token or token[0] not in "np" or not token[1:].isdigit():
+        return None
+    return token[0], int(token[1:])
+
+async def render_participant_page(callback: types.CallbackQuery, gw_id: int, page: int = 0, cursor=None):
     try:
-        participants = await db.get_participants(gw_id)
+        if not await db.get_giveaway(gw_id):
+            await callback.answer("Розыгрыш не найден", show_alert=True)
+            return
+        per_page = PARTICIPANTS_PER_PAGE
+        total = await db.get_participants_count(gw_id)
+        total_pages = max(1, (total + per_page - 1) // per_page)
+
+        async def first_page():
+            rows = await db.get_participants_page(gw_id, limit=per_page + 1)
+            return rows[:per_page], rows[per_page]['id'] if len(rows) > per_page else None
+
+        if cursor is None:
+            page = 0
+            display_participants, next_start = await first_page()
+        elif cursor[0] == "p":
+            # The page ending before X is followed by the page starting at X
+            display_participants = await db.get_participants_page(gw_id, cursor[1], before=True, limit=per_page)
+            next_start = cursor[1]
+        else:
+            # One extra row tells where the next page starts
+            rows = await db.get_participants_page(gw_id, cursor[1], limit=per_page + 1)
+            display_participants, next_start = rows[:per_page], rows[per_page]['id'] if len(rows) > per_page else None
+
+        if cursor and not display_participants:
+            # The cursor participant is gone, start over
+            page = 0
+            display_participants, next_start = await first_page()
+        page = max(0, min(page, total_pages - 1))
         
-        text = f"👥 <b>Участники розыгрыша #{gw_id} ({len(participants)} чел.):</b>\n"
+        text = f"👥 <b>Участники розыгрыша #{gw_id} ({total} чел.):</b>\n"
         
         kb_rows = []
         
-        per_page = 25
-        total_pages = max(1, (len(participants) + per_page - 1) // per_page)
-        page = max(0, min(page, total_pages - 1))
-        
-        display_participants = participants[page * per_page : (page + 1) * per_page]
+        # Re-render the same page after a pick
+        page_token = f"n{display_participants[0]['id']}" if display_participants else ""
         
         for p in display_participants:
             name = p['full_name'] or p['username'] or str(p['id'])
-            kb_rows.append([InlineKeyboardButton(text=f"👤 {name}", callback_data=f"pick_winner_{gw_id}_{p['id']}_{page}")])
+            mark = "🏆" if p['is_winner'] else "👤"
+            kb_rows.append([InlineKeyboardButton(text=f"{mark} {name}", callback_data=f"pick_winner_{gw_id}_{p['id']}_{page}_{page_token}")])
 
         # Pagination controls
         nav_row = []
-        if page > 0:
-            nav_row.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=f"part_gw_{gw_id}_{page-1}"))
-        if page < total_pages - 1:
-            nav_row.append(InlineKeyboardButton(text="Вперед ➡️", callback_data=f"part_gw_{gw_id}_{page+1}"))
+        if page > 0 and display_participants:
+            nav_row.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=f"part_gw_{gw_id}_{page-1}_p{display_participants[0]['id']}"))
+        if next_start is not None:
+            nav_row.append(InlineKeyboardButton(text="Вперед ➡️", callback_data=f"part_gw_{gw_id}_{page+1}_n{next_start}"))
             
         if nav_row:
             kb_rows.append(nav_row)
 
         kb_rows.insert(0, [InlineKeyboardButton(text="🎲 Случайный победитель", callback_data=f"pick_random_{gw_id}")])
+        kb_rows.insert(1, [InlineKeyboardButton(text=f"🎲 ×{k}", callback_data=f"pick_random_{gw_id}_{k}") for k in (3, 5, 10)])
+        kb_rows.append([InlineKeyboardButton(text="🔎 Проверить подписки всех", callback_data=f"verify_gw_{gw_id}")])
+        kb_rows.append([InlineKeyboardButton(text=f"📥 {fmt.upper()}", callback_data=f"export_gw_{gw_id}_{fmt}") for fmt in EXPORT_FORMATS])
         kb_rows.append([InlineKeyboardButton(text="📢 Опубликовать результаты", callback_data=f"finish_gw_{gw_id}")])
         kb_rows.append([InlineKeyboardButton(text="🔙 К списку", callback_data="back_to_list_part")])
         
@@ -122,7 +168,7 @@ async def render_participant_page(callback: types.CallbackQuery, gw_id: int, pag
         msg_text = text + f"\n📄 Страница {page + 1} из {total_pages}\n👇 Нажми на участника, чтобы выбрать победителем (или выбери случайного)."
         await callback.message.edit_text(msg_text, reply_markup=kb, parse_mode="HTML")
     except Exception as e:
-        print(f"ERROR in render_participant_page: {e}")
+        logger.exception("Failed to render participants of giveaway #%s", gw_id)
         await callback.answer(f"Ошибка: {e}", show_alert=True)
 
 @router.callback_query(F.data.startswith("part_gw_"))
@@ -130,7 +176,50 @@ async def show_participants_menu(callback: types.CallbackQuery):
     parts = callback.data.split("_")
     gw_id = int(parts[2])
     page = int(parts[3]) if len(parts) > 3 else 0
-    await render_participant_page(callback, gw_id, page)
+    cursor = parse_page_cursor(parts[4]) if len(parts) > 4 else None
+    await render_participant_page(callback, gw_id, page, cursor)
+
+@router.callback_query(F.data.startswith("export_gw_"))
+async def export_participants(callback: types.CallbackQuery, bot: Bot):
+    # Callback queries are not covered by the router's admin filter
+    if callback.from_user.id not in ADMIN_IDS:
+        await callback.answer()
+        return
+
+    parts = callback.data.split("_")
+    gw_id = int(parts[2])
+    fmt = parts[3] if len(parts) > 3 and parts[3] in EXPORT_FORMATS else "csv"
+    if not await db.get_giveaway(gw_id):
+        await callback.answer("Розыгрыш не найден", show_alert=True)
+        return
+    if is_export_running(gw_id):
+        await callback.answer("⏳ Выгрузка этого розыгрыша уже идет.", show_alert=True)
+        return
+
+    await callback.answer("📤 Выгрузка началась")
+    progress = await callback.message.answer(f"📤 Выгрузка участников #{gw_id}...")
+    # Runs in the background, the handler returns right away
+    start_export(bot, gw_id, fmt, callback.message.chat.id, progress.message_id)
+
+@router.callback_query(F.data.startswith("verify_gw_"))
+async def verify_participants(callback: types.CallbackQuery, bot: Bot):
+    if callback.from_user.id not in ADMIN_IDS:
+        await callback.answer()
+        return
+
+    gw_id = int(callback.data.split("_")[2])
+    if not await db.get_giveaway(gw_id):
+        await callback.answer("Розыгрыш не найден", show_alert=True)
+        return
+    if verification_jobs.is_running(gw_id):
+        job = await db.get_verification_job(gw_id)
+        await callback.answer(progress_text(job)[:200], show_alert=True)
+        return
+
+    await callback.answer("🔎 Проверка началась")
+    progress = await callback.message.answer(f"🔎 Проверка подписок, розыгрыш #{gw_id}...")
+    # Runs in the background and survives restarts; draws use its results
+    await verification_jobs.start(bot, gw_id, callback.message.chat.id, progress.message_id)
 
 @router.callback_query(F.data == "back_to_list_part")
 async def back_to_list_part(callback: types.CallbackQuery):
@@ -143,71 +232,43 @@ async def pick_specific_winner(callback: types.CallbackQuery):
     gw_id = int(parts[2])
     user_id = int(parts[3])
     page = int(parts[4]) if len(parts) > 4 else 0
+    cursor = parse_page_cursor(parts[5]) if len(parts) > 5 else None
     
-    await db.set_winner(user_id, gw_id)
+    if not await db.set_winner(user_id, gw_id):
+        await callback.answer("Участник или розыгрыш не найден", show_alert=True)
+        return
     
     user = await db.get_user(user_id)
     name = user['full_name'] if user else str(user_id)
     
     await callback.answer(f"🏆 {name} выбран победителем!", show_alert=True)
-    await render_participant_page(callback, gw_id, page)
+    # Only this page is re-read, the winner shows up with 🏆
+    await render_participant_page(callback, gw_id, page, cursor)
 
 @router.callback_query(F.data.startswith("pick_random_"))
 async def pick_random_winner(callback: types.CallbackQuery, bot: Bot):
-    gw_id = int(callback.data.split("_")[2])
-    # db.get_participants returns list of user Row objects (u.*)
-    participants = await db.get_participants(gw_id)
+    parts = callback.data.split("_")
+    gw_id = int(parts[2])
+    k = int(parts[3]) if len(parts) > 3 else 1
     gw = await db.get_giveaway(gw_id)
-    
-    # Filter out existing winners
-    current_winners = await db.get_winners(gw_id)
-    # db.get_winners also returns u.*
-    winner_ids = [w['id'] for w in current_winners]
-    
-    eligible = []
-    
-    # Check subscription for random pick to be safe
-    required_channels = [c.strip() for c in gw['channel_ids'].split(',') if c.strip()]
-    cleaned_channels = [] 
-    
-    # Resolve channel IDs to int if possible for check_subscription
-    for c in required_channels:
-        try:
-            cleaned_channels.append(int(c))
-        except:
-            cleaned_channels.append(c)
+    if not gw:
+        await callback.answer("Розыгрыш не найден", show_alert=True)
+        return
 
-    random.shuffle(participants)
-    
-    valid_winner = None
-    
     await callback.answer("🎲 Ищем победителя...", show_alert=False)
-    
-    for p in participants:
-        # p is user Row
-        if p['id'] in winner_ids:
-            continue
-            
-        # Check sub
-        is_sub = True
-        for ch in cleaned_channels:
-            if not await check_subscription(bot, p['id'], ch):
-                is_sub = False
-                break
-        
-        if is_sub:
-            valid_winner = p
-            break
+
+    # Samples and verifies candidates without loading the participant list
+    winners = await draw_winners(bot, gw, k)
             
-    if not valid_winner:
-        await callback.answer("🤷‍♂️ Нет доступных участников (или все отписались).", show_alert=True)
+    if not winners:
+        await callback.message.answer("🤷‍♂️ Нет доступных участников (или все отписались).")
         return
 
-    await db.set_winner(valid_winner['id'], gw_id)
-    
-    name = valid_winner['full_name'] or valid_winner['username'] or str(valid_winner['id'])
-    
-    await callback.answer(f"🎲 Случайный победитель: {name}", show_alert=True)
+    names = [w['full_name'] or w['username'] or str(w['id']) for w in winners]
+    text = "🎲 Случайный победитель: " + names[0] if len(names) == 1 else "🎲 Случайные победители:\n" + "\n".join(f"🥇 {name}" for name in names)
+    if len(names) < k:
+        text += f"\n\n⚠️ Нашлось только {len(names)} из {k}."
+    await callback.message.answer(text)
     await render_participant_page(callback, gw_id, 0)
 
 
@@ -228,6 +289,7 @@ async def manage_giveaway_actions(callback: types.CallbackQuery):
     
     kb = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="✏️ Изменить текст", callback_data=f"edit_desc_{gw_id}")],
+        [InlineKeyboardButton(text="⏰ Время итогов", callback_data=f"edit_end_{gw_id}")],
         [InlineKeyboardButton(text="🗑 Удалить розыгрыш", callback_data=f"delete_gw_{gw_id}")],
         [InlineKeyboardButton(text="🔙 К списку", callback_data="back_to_manage_list")]
     ])
@@ -242,17 +304,24 @@ async def back_to_manage_list(callback: types.CallbackQuery):
 @router.callback_query(F.data.startswith("delete_gw_"))
 async def delete_giveaway_confirm(callback: types.CallbackQuery):
     gw_id = int(callback.data.split("_")[2])
-    await db.delete_giveaway(gw_id)
+    if not await db.delete_giveaway(gw_id):
+        await callback.answer("Розыгрыш не найден", show_alert=True)
+        return
     await callback.answer("✅ Розыгрыш удален.", show_alert=True)
     await manage_menu(callback.message)
 
 # Edit FSM
 class EditGiveaway(StatesGroup):
     waiting_for_new_desc = State()
+    waiting_for_end_time = State()
+    waiting_for_winners_count = State()
 
 @router.callback_query(F.data.startswith("edit_desc_"))
 async def edit_desc_start(callback: types.CallbackQuery, state: FSMContext):
     gw_id = int(callback.data.split("_")[2])
+    if not await db.get_giveaway(gw_id):
+        await callback.answer("Розыгрыш не найден", show_alert=True)
+        return
     await state.update_data(edit_gw_id=gw_id)
     await state.set_state(EditGiveaway.waiting_for_new_desc)
     
@@ -270,7 +339,10 @@ async def edit_desc_save(message: types.Message, state: FSMContext, bot: Bot):
     gw_id = data.get('edit_gw_id')
     
     new_text = get_message_html(message)
-    await db.update_giveaway_description(gw_id, new_text)
+    if not await db.update_giveaway_description(gw_id, new_text):
+        await state.clear()
+        await message.answer("Розыгрыш не найден.", reply_markup=main_admin_keyboard())
+        return
     
     # Try update channel
     gw = await db.get_giveaway(gw_id)
@@ -279,39 +351,12 @@ async def edit_desc_save(message: types.Message, state: FSMContext, bot: Bot):
     if gw['publish_channel_id'] and gw['publish_message_id']:
         try:
             # Reconstruct channels text
-            channel_ids = gw['channel_ids'].split(',')
-            lines = []
-            for cid in channel_ids:
-                 try: 
-                     chat = await bot.get_chat(cid)
-                     link = chat.username
-                     name = chat.title
-                     if link:
-                         lines.append(f"👉 <a href='https://t.me/{link}'>{name}</a>")
-                     else:
-                         lines.append(f"👉 {name}")
-                 except:
-                     lines.append(f"👉 Канал {cid}")
-            
-            channels_text = "\n\n📢 <b>Подпишись на:</b>\n" + "\n".join(lines)
-            final_text = new_text + channels_text
+            final_text = new_text + await subscribe_text(parse_channel_ids(gw['channel_ids']))
             
             # Reconstruct KB with the share button
-            try:
-                chat = await bot.get_chat(gw['publish_channel_id'])
-                if chat.username:
-                    post_url = f"https://t.me/{chat.username}/{gw['publish_message_id']}"
-                else:
-                    post_url = f"https://t.me/c/{str(chat.id)[4:]}/{gw['publish_message_id']}"
-                share_url = f"https://t.me/share/url?url={post_url}&text=Участвуй в конкурсе! 🎁"
-                kb = InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text=gw['button_text'], callback_data=f"participate_{gw_id}")],
-                    [InlineKeyboardButton(text="🔗 Поделиться", url=share_url)]
-                ])
-            except Exception:
-                kb = InlineKeyboardMarkup(inline_keyboard=[[
-                    InlineKeyboardButton(text=gw['button_text'], callback_data=f"participate_{gw_id}")
-                ]])
+            share_url = await resolve_share_url(bot, gw)
+            count = await db.get_participants_count(gw_id)
+            kb = giveaway_post_keyboard(gw_id, gw['button_text'], count, share_url)
             
             await bot.edit_message_caption(
                 chat_id=gw['publish_channel_id'], 
@@ -321,7 +366,7 @@ async def edit_desc_save(message: types.Message, state: FSMContext, bot: Bot):
             )
             updated_in_channel = True
         except Exception as e:
-            print(f"Edit error: {e}")
+            logger.debug("Caption edit failed for giveaway #%s, trying text: %s", gw_id, e)
             # If caption fails, try text
             try:
                 await bot.edit_message_text(
@@ -331,8 +376,8 @@ async def edit_desc_save(message: types.Message, state: FSMContext, bot: Bot):
                     reply_markup=kb
                 )
                 updated_in_channel = True
-            except:
-                pass
+            except Exception as e:
+                logger.warning("Failed to update the post of giveaway #%s: %s", gw_id, e)
 
     await state.clear()
     msg = "✅ Описание обновлено!"
@@ -341,6 +386,70 @@ async def edit_desc_save(message: types.Message, state: FSMContext, bot: Bot):
     
     await message.answer(msg, reply_markup=main_admin_keyboard())
 
+@router.callback_query(F.data.startswith("edit_end_"))
+async def edit_end_start(callback: types.CallbackQuery, state: FSMContext):
+    gw_id = int(callback.data.split("_")[2])
+    gw = await db.get_giveaway(gw_id)
+    if not gw or gw['status'] != 'active':
+        await callback.answer("Розыгрыш уже завершен", show_alert=True)
+        return
+
+    await state.update_data(edit_gw_id=gw_id)
+    await state.set_state(EditGiveaway.waiting_for_end_time)
+    current = format_end_time(gw['end_time']) if gw['end_time'] else "не задано"
+    await callback.message.answer(
+        f"⏰ Сейчас: {current}.\n"
+        "Введи новое время итогов (<code>25.12.2026 18:00</code> или <code>3d</code>), "
+        "<code>-</code> чтобы убрать автозавершение, или /cancel для отмены.",
+        reply_markup=types.ReplyKeyboardRemove()
+    )
+    await callback.answer()
+
+@router.message(EditGiveaway.waiting_for_end_time)
+async def edit_end_save(message: types.Message, state: FSMContext):
+    data = await state.get_data()
+    gw_id = data.get('edit_gw_id')
+    text = (message.text or "").strip()
+
+    if text == "-":
+        # The scheduler drops the giveaway via the end_time_changed event
+        found = await db.set_end_time(gw_id, None)
+        await state.clear()
+        if not found:
+            await message.answer("Розыгрыш не найден.", reply_markup=main_admin_keyboard())
+            return
+        await message.answer(f"✅ Автозавершение розыгрыша #{gw_id} отключено.", reply_markup=main_admin_keyboard())
+        return
+
+    end_time = parse_end_time(text)
+    if not end_time:
+        await message.answer("❌ Не понял время. Нужна дата в будущем: <code>25.12.2026 18:00</code> или <code>3d</code>.")
+        return
+
+    gw = await db.get_giveaway(gw_id)
+    await state.update_data(edit_end_time=end_time)
+    await state.set_state(EditGiveaway.waiting_for_winners_count)
+    await message.answer(f"🏆 Сколько победителей выбрать? Сейчас: {gw['winners_count']}.")
+
+@router.message(EditGiveaway.waiting_for_winners_count)
+async def edit_winners_count_save(message: types.Message, state: FSMContext):
+    data = await state.get_data()
+    gw_id = data.get('edit_gw_id')
+    text = (message.text or "").strip()
+    if not text.isdigit() or not 1 <= int(text) <= MAX_WINNERS:
+        await message.answer(f"❌ Введи число от 1 до {MAX_WINNERS}.")
+        return
+
+    found = await db.set_end_time(gw_id, data['edit_end_time'], int(text))
+    await state.clear()
+    if not found:
+        await message.answer("Розыгрыш не найден.", reply_markup=main_admin_keyboard())
+        return
+    await message.answer(
+        f"✅ Итоги розыгрыша #{gw_id} будут подведены {format_end_time(data['edit_end_time'])}, победителей: {text}.",
+        reply_markup=main_admin_keyboard()
+    )
+
 @router.message(F.text, F.state == "waiting_for_winner_username")
 async def pick_manual_finish(message: types.Message, state: FSMContext, bot: Bot):
     data = await state.get_data()
@@ -390,61 +499,32 @@ async def pick_manual_finish(message: types.Message, state: FSMContext, bot: Bot
 @router.callback_query(F.data.startswith("finish_gw_"))
 async def publish_results(callback: types.CallbackQuery, bot: Bot):
     try:
-        print(f"DEBUG: publish_results called for {callback.data}")
         giveaway_id = int(callback.data.split("_")[2])
         giveaway = await db.get_giveaway(giveaway_id)
+        if not giveaway:
+            await callback.answer("Розыгрыш не найден", show_alert=True)
+            return
         winners = await db.get_winners(giveaway_id)
         
         if not winners:
-            print("DEBUG: No winners selected")
             await callback.answer("❌ Сначала выбери победителей!", show_alert=True)
             return
             
         # Finish and Announce
-        await db.finish_giveaway(giveaway_id)
-        
+        try:
+            await announce_results(bot, giveaway_id)
+        except Exception as e:
+            logger.exception("Failed to post results of giveaway #%s", giveaway_id)
+            await callback.message.answer(f"⚠️ Ошибка публикации: {e}")
+            return
+
         if giveaway['publish_channel_id']:
-            try:
-                winners_text = "\n".join([f"🥇 {w['full_name']} (@{w['username']})" for w in winners])
-                result_text = (
-                    f"🎉 <b>РОЗЫГРЫШ ЗАВЕРШЕН!</b>\n\n"
-                    f"🎁 Приз: {giveaway['description'].splitlines()[0]}\n\n"
-                    f"🏆 <b>Победители:</b>\n"
-                    f"{winners_text}\n\n"
-                    f"Поздравляем! 🥳"
-                )
-                bot_info = await bot.me()
-                bot_username = bot_info.username
-                url = f"https://t.me/{bot_username}?start=res_{giveaway_id}"
-                
-                kb_results = InlineKeyboardMarkup(inline_keyboard=[[
-                    InlineKeyboardButton(text="🏆 Проверить результаты", url=url)
-                ]])
-                
-                await bot.send_message(chat_id=giveaway['publish_channel_id'], text=result_text, reply_markup=kb_results)
-                print(f"DEBUG: Results posted to {giveaway['publish_channel_id']}")
-                
-                # Remove button from original post and replace with Results button
-                if giveaway['publish_message_id']:
-                    try:
-                        print(f"DEBUG: Replacing button for msg {giveaway['publish_message_id']}")
-                        await bot.edit_message_reply_markup(
-                            chat_id=giveaway['publish_channel_id'], 
-                            message_id=giveaway['publish_message_id'], 
-                            reply_markup=kb_results
-                        )
-                    except Exception as e:
-                         print(f"DEBUG: Failed to replace button: {e}")
-                    
-                await callback.message.edit_text(f"✅ Результаты опубликованы в канале!\n\n{winners_text}", reply_markup=None)
-                
-            except Exception as e:
-                print(f"ERROR posting results: {e}")
-                await callback.message.answer(f"⚠️ Ошибка публикации: {e}")
+            winners_text = "\n".join([f"🥇 {w['full_name']} (@{w['username']})" for w in winners])
+            await callback.message.edit_text(f"✅ Результаты опубликованы в канале!\n\n{winners_text}", reply_markup=None)
         else:
             await callback.message.edit_text("✅ Розыгрыш закрыт (без публикации в канале).", reply_markup=None)
     except Exception as e:
-        print(f"CRITICAL ERROR in publish_results: {e}")
+        logger.exception("Failed to publish results for %r", callback.data)
         await callback.message.answer(f"❌ Критическая ошибка: {e}")
 
 @router.callback_query(F.data == "back_to_list")
@@ -0,0 +1,14 @@
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+def giveaway_post_keyboard(giveaway_id, button_text, count=None, share_url=None):
+    """
+    Keyboard under a published giveaway post: the participate button
+    (with the participant count, if given) and the share button.
+    """
+    base_text = (button_text or "Участвую").split(" (")[0]
+    text = f"{base_text} ({count})" if count is not None else base_text
+
+    kb = [[InlineKeyboardButton(text=text, callback_data=f"participate_{giveaway_id}")]]
+    if share_url:
+        kb.append([InlineKeyboardButton(text="🔗 Поделиться", url=share_url)])
+    return InlineKeyboardMarkup(inline_keyboard=kb)
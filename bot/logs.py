@@ -0,0 +1,114 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+# Attributes every LogRecord has; anything else was passed in `extra`
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "sampled"}
+
+def _extra_fields(record) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_FIELDS}
+
+class TextFormatter(logging.Formatter):
+    """
+    "time LEVEL logger: message key=value ..." with the `extra` fields appended.
+    """
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record) -> str:
+        text = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            text += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return text
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line, `extra` fields included as top-level keys.
+    """
+    def format(self, record) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class SamplingFilter(logging.Filter):
+    """
+    Lets through only `rate` of the records logged with extra={"sampled": True},
+    meant for per-tap debug events that would flood the log under load.
+    """
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record) -> bool:
+        if not getattr(record, "sampled", False) or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Puts the record on the queue as is. The stock QueueHandler formats the
+    message first, which would happen on the event loop.
+    """
+    def prepare(self, record):
+        return record
+
+_listener = None
+
+def setup_logging(level: str = "INFO", json_output: bool = False, sample_rate: float = 1.0, stream=None):
+    """
+    Routes all logging through a queue: callers only enqueue the record,
+    formatting and console I/O happen in the listener thread.
+    """
+    global _listener
+    stop_logging()
+
+    if stream is None:
+        # The console gets its own UTF-8 stream, sys.stdout is left alone
+        stream = open(sys.stdout.fileno(), "w", encoding="utf-8", errors="backslashreplace",
+                      closefd=False, buffering=1)
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter() if json_output else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    handler = DeferredQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(sample_rate))
+
+    # DEBUG is meant for the bot's own loggers, libraries stay at INFO
+    requested = level
+    level = logging.getLevelName(level.upper()) if isinstance(level, str) else level
+    # getLevelName returns "Level X" for unknown names
+    unknown_level = not isinstance(level, int)
+    if unknown_level:
+        level = logging.INFO
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(max(level, logging.INFO))
+    logging.getLogger("bot").setLevel(level)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    if unknown_level:
+        logging.getLogger(__name__).warning("Unknown LOG_LEVEL %r, using INFO", requested)
+
+def stop_logging():
+    """
+    Flushes what is still queued and stops the listener thread.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,108 +1,156 @@
 import asyncio
 import logging
-import sys
-import io
-
-# Fix for Windows console encoding
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
+from aiohttp import web
 from aiogram import Bot, Dispatcher, F
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 
-from bot.config import BOT_TOKEN
+from bot.config import (BOT_TOKENS, WEBHOOK_URL, WEBHOOK_PATH, WEBAPP_HOST, WEBAPP_PORT, TELEGRAM_API_URL,
+                        METRICS_HOST, METRICS_PORT, LOG_LEVEL, LOG_JSON, LOG_SAMPLE_RATE, webhook_secret)
 from bot.database.core import db
+from bot.ratelimit import api_scheduler
+from bot.counters import counter_updater
+from bot.verification import verification_jobs
+from bot.scheduler import giveaway_scheduler
+from bot.channels import channel_sweeper
+from bot.participation import participation_gate
+from bot.tenants import BotScope, all_bots, default_bot_id, register_bot
+from bot.metrics import ApiMetrics, MetricsServer, instrument_database, setup_handler_metrics
+from bot.logs import setup_logging
 from bot.handlers import admin_create, admin_manage, user, admin_channels
 
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-
-async def update_counters_loop(bot: Bot):
-    await asyncio.sleep(5) # Give the bot time to fully start
-    last_counts = {} # Cache to prevent spamming API and save memory/CPU
-    
-    while True:
-        try:
-            giveaways = await db.get_active_giveaways()
-            for giveaway in giveaways:
-                giveaway_id = giveaway['id']
-                if not giveaway.get('publish_message_id') or not giveaway.get('publish_channel_id'):
-                    continue
-                    
-                count = await db.get_participants_count(giveaway_id)
-                
-                # Check cache: don't update if nothing changed (saves memory & avoids Rate Limits)
-                if last_counts.get(giveaway_id) == count:
-                    continue
-                    
-                last_counts[giveaway_id] = count
-                
-                raw_btn_text = "Участвую"
-                if 'button_text' in giveaway.keys() and giveaway['button_text']:
-                    raw_btn_text = giveaway['button_text']
-                    
-                base_text = raw_btn_text.split(" (")[0]
-                new_btn_text = f"{base_text} ({count})"
-                
-                new_kb = [[InlineKeyboardButton(text=new_btn_text, callback_data=f"participate_{giveaway_id}")]]
-                
-                try:
-                    chat = await bot.get_chat(giveaway['publish_channel_id'])
-                    if chat.username:
-                        post_url = f"https://t.me/{chat.username}/{giveaway['publish_message_id']}"
-                    else:
-                        invite_link = await bot.export_chat_invite_link(giveaway['publish_channel_id'])
-                        post_url = f"{invite_link}/{giveaway['publish_message_id']}"
-                    share_url = f"https://t.me/share/url?text=Участвуй в розыгрыше!&url={post_url}"
-                    new_kb.append([InlineKeyboardButton(text="🚀 Поделиться розыгрышем", url=share_url)])
-                except Exception:
-                    pass
-                    
-                markup = InlineKeyboardMarkup(inline_keyboard=new_kb)
-                
-                try:
-                    await bot.edit_message_reply_markup(
-                        chat_id=giveaway['publish_channel_id'],
-                        message_id=giveaway['publish_message_id'],
-                        reply_markup=markup
-                    )
-                    logging.info(f"Updated counter for Giveaway #{giveaway_id} to {count}")
-                except Exception as e:
-                    # Ignore "message is not modified" errors
-                    if "is not modified" not in str(e).lower() and "message to edit not found" not in str(e).lower():
-                        logging.error(f"Failed to update counter for GW {giveaway_id}: {e}")
-                        
-        except Exception as e:
-            logging.error(f"Error in background counter updater: {e}")
-            
-        await asyncio.sleep(20) # Update every 20 seconds
-
-async def main():
-    # ... existing logic ...
-    logging.basicConfig(level=logging.INFO, stream=sys.stdout)
-    
-    bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+logger = logging.getLogger(__name__)
+
+instrument_database(db)
+
+async def on_startup(dispatcher: Dispatcher):
+    # One database, one set of background tasks for all hosted bots
+    await db.open()
+    await db.migrate()
+    # Rows from before multi-bot hosting belong to the first bot
+    if default_bot_id():
+        await db.adopt_rows(default_bot_id())
+    await db.load_active_giveaways()
+
+    if METRICS_PORT:
+        dispatcher["metrics_server"] = MetricsServer(METRICS_HOST, METRICS_PORT)
+        await dispatcher["metrics_server"].start()
+
+    # Start background task safely
+    dispatcher["updater_task"] = asyncio.create_task(counter_updater.run())
+    # Subscription re-checks interrupted by the last shutdown
+    await verification_jobs.resume()
+    await giveaway_scheduler.start()
+    channel_sweeper.start()
+    logger.info("Bot started! Hosting %s bots.", len(all_bots()))
+
+async def on_shutdown(dispatcher: Dispatcher):
+    updater_task = dispatcher.workflow_data.pop("updater_task", None)
+    if updater_task:
+        updater_task.cancel()
+    await verification_jobs.stop()
+    await giveaway_scheduler.stop()
+    await channel_sweeper.stop()
+    metrics_server = dispatcher.workflow_data.pop("metrics_server", None)
+    if metrics_server:
+        await metrics_server.stop()
+    await api_scheduler.close()
+    await db.close()
+
+def webhook_path(bot: Bot, bots: list) -> str:
+    return WEBHOOK_PATH if len(bots) == 1 else f"{WEBHOOK_PATH}/{bot.id}"
+
+async def on_webhook_startup(bots: list, dispatcher: Dispatcher):
+    for bot in bots:
+        path = webhook_path(bot, bots)
+        await bot.set_webhook(
+            f"{WEBHOOK_URL.rstrip('/')}{path}",
+            secret_token=webhook_secret(bot.token),
+            allowed_updates=dispatcher.resolve_used_update_types(),
+        )
+        logger.info("Webhook of bot %s set to %s%s", bot.id, WEBHOOK_URL.rstrip('/'), path)
+
+def create_session() -> AiohttpSession:
+    """
+    HTTP session for the Bot API. One is shared by all hosted bots: one
+    connection pool, and every call goes through the same rate limiter.
+    """
+    session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)) if TELEGRAM_API_URL else AiohttpSession()
+    # All outgoing API calls are paced and prioritised in one place
+    session.middleware(api_scheduler)
+    # Registered after the scheduler: times the requests, not the queueing
+    session.middleware(ApiMetrics())
+    return session
+
+def create_bot(token: str = BOT_TOKENS[0] if BOT_TOKENS else None, session: AiohttpSession = None) -> Bot:
+    bot = Bot(token=token, session=session or create_session(), default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    # Background tasks find the bot that owns a giveaway here
+    register_bot(bot)
+    return bot
+
+def create_bots(tokens: list = BOT_TOKENS) -> list:
+    session = create_session()
+    return [create_bot(token, session) for token in tokens]
+
+def create_dispatcher() -> Dispatcher:
     dp = Dispatcher()
-    
-    await db.create_tables()
+
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    # Each update only sees the data of the bot that received it
+    dp.update.outer_middleware(BotScope())
+    setup_handler_metrics(dp)
+    # Repeated participation taps are answered before reaching any router
+    dp.callback_query.outer_middleware(participation_gate)
 
     dp.include_router(admin_channels.router)
     dp.include_router(admin_create.router)
     dp.include_router(admin_manage.router)
     dp.include_router(user.router)
+    return dp
 
-    logging.info("Bot started!")
-    
-    # Start background task safely
-    updater_task = asyncio.create_task(update_counters_loop(bot))
-    
-    try:
-        await dp.start_polling(bot)
-    finally:
-        updater_task.cancel()
+def create_webhook_app(bots: list, dp: Dispatcher) -> web.Application:
+    """
+    aiohttp app that receives updates on WEBHOOK_PATH, or on
+    WEBHOOK_PATH/<bot id> for each bot when there are several. Requests
+    without the right secret token header are rejected. Bot startup/shutdown
+    (database, background tasks) runs with the app's own startup/shutdown.
+    """
+    dp.startup.register(on_webhook_startup)
+
+    app = web.Application()
+    for bot in bots:
+        SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=webhook_secret(bot.token)).register(
+            app, path=webhook_path(bot, bots))
+    setup_application(app, dp, bots=bots)
+    return app
+
+async def run_polling():
+    bots = create_bots()
+    dp = create_dispatcher()
+    # Switching back from webhook mode
+    for bot in bots:
+        await bot.delete_webhook()
+    # chat_member updates are only delivered when asked for explicitly
+    await dp.start_polling(*bots, allowed_updates=dp.resolve_used_update_types())
+
+def main():
+    # Console output is written by a separate thread, never by the event loop
+    setup_logging(LOG_LEVEL, LOG_JSON, LOG_SAMPLE_RATE)
+
+    if WEBHOOK_URL:
+        app = create_webhook_app(create_bots(), create_dispatcher())
+        # run_app stops gracefully on SIGINT/SIGTERM
+        web.run_app(app, host=WEBAPP_HOST, port=WEBAPP_PORT, print=logger.info)
+    else:
+        asyncio.run(run_polling())
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        main()
     except KeyboardInterrupt:
-        logging.info("Bot stopped.")
+        logger.info("Bot stopped.")
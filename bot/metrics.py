@@ -0,0 +1,273 @@
+import bisect
+import functools
+import inspect
+import logging
+import time
+
+from aiohttp import web
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+from bot.counters import counter_updater
+from bot.database.core import db, Database
+from bot.participation import participation_gate
+from bot.ratelimit import api_scheduler
+from bot.utils import membership_lookups, subscription_cache
+
+logger = logging.getLogger(__name__)
+
+# Handlers wait on the network, DB calls mostly do not
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}  # label values -> value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for values, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labels, values)} {_format_value(value)}"
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def set(self, *labels, value: float):
+        # For totals that are counted elsewhere and copied on scrape
+        self._values[labels] = value
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, *labels, value: float):
+        self._values[labels] = value
+
+class Histogram(Metric):
+    """
+    Cumulative buckets are only built on render; observe() just bumps
+    one bucket, the sum and the count.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, *labels, value: float):
+        series = self._values.get(labels)
+        if series is None:
+            # [per-bucket counts..., +Inf count, sum]
+            series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for values, series in self._values.items():
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                total += count
+                le = 'le="{}"'.format(bound if bound == "+Inf" else _format_value(bound))
+                yield f"{self.name}_bucket{_format_labels(self.labels, values, le)} {total}"
+            yield f"{self.name}_sum{_format_labels(self.labels, values)} {_format_value(series[-1])}"
+            yield f"{self.name}_count{_format_labels(self.labels, values)} {total}"
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, func):
+        """
+        Registers a coroutine that refreshes gauges right before a scrape.
+        """
+        self._collectors.append(func)
+        return func
+
+    async def render(self) -> str:
+        for collect in self._collectors:
+            try:
+                await collect()
+            except Exception:
+                logger.exception("Metrics collector %s failed", collect.__name__)
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+handler_duration = registry.register(Histogram(
+    "bot_handler_duration_seconds", "Time spent in update handlers.", ("router", "handler")))
+handler_errors = registry.register(Counter(
+    "bot_handler_errors_total", "Handlers that raised.", ("router", "handler")))
+
+db_duration = registry.register(Histogram(
+    "bot_db_duration_seconds", "Time spent in Database methods.", ("method",), DB_BUCKETS))
+db_rows = registry.register(Counter(
+    "bot_db_rows_total", "Rows returned by Database methods.", ("method",)))
+db_errors = registry.register(Counter(
+    "bot_db_errors_total", "Database methods that raised.", ("method",)))
+
+api_duration = registry.register(Histogram(
+    "bot_api_duration_seconds", "Bot API request time, not counting time queued by the rate limiter.", ("method",)))
+api_errors = registry.register(Counter(
+    "bot_api_errors_total", "Failed Bot API requests.", ("method", "error")))
+
+active_giveaways = registry.register(Gauge("bot_active_giveaways", "Giveaways with status 'active'."))
+pending_counter_edits = registry.register(Gauge("bot_pending_counter_edits", "Posts whose counter is waiting to be edited."))
+api_queue_depth = registry.register(Gauge("bot_api_queue_depth", "Bot API calls waiting for the rate limiter.", ("priority",)))
+db_pending_writes = registry.register(Gauge("bot_db_pending_writes", "Writes waiting for the next batch."))
+subscription_cache_size = registry.register(Gauge("bot_subscription_cache_size", "Entries in the subscription cache."))
+subscription_cache_lookups = registry.register(Counter(
+    "bot_subscription_cache_lookups_total", "Subscription cache lookups.", ("result",)))
+
+membership_sources = registry.register(Counter(
+    "bot_membership_lookups_total", "Memberships not in the memory cache, by where they were found.", ("source",)))
+participation_dedup = registry.register(Counter(
+    "bot_participation_deduplicated_total", "Participation taps answered without running the handler.", ("reason",)))
+participation_joined = registry.register(Gauge(
+    "bot_participation_joined_cache_size", "(user, giveaway) pairs answered from memory."))
+
+@registry.collector
+async def collect_runtime():
+    active_giveaways.set(value=len(await db.get_active_giveaways()))
+    pending_counter_edits.set(value=counter_updater.stats()["dirty"])
+    for priority, depth in api_scheduler.stats()["queue_depth"].items():
+        api_queue_depth.set(priority, value=depth)
+    db_pending_writes.set(value=db.stats()["pending_writes"])
+    cache = subscription_cache.stats()
+    subscription_cache_size.set(value=cache["size"])
+    subscription_cache_lookups.set("hit", value=cache["hits"])
+    subscription_cache_lookups.set("miss", value=cache["misses"])
+    for source, count in membership_lookups.items():
+        membership_sources.set(source, value=count)
+    gate = participation_gate.stats()
+    participation_dedup.set("joined", value=gate["joined_hits"])
+    participation_dedup.set("in_flight", value=gate["in_flight_hits"])
+    participation_joined.set(value=gate["joined"])
+
+def _row_count(result) -> int:
+    if result is None or isinstance(result, bool):
+        return 0
+    if isinstance(result, (list, tuple, dict)):
+        return len(result)
+    return 1
+
+def instrument_database(database: Database):
+    """
+    Times every public query method of `database` and counts the rows it returns.
+    """
+    def wrap(name, method):
+        @functools.wraps(method)
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = await method(*args, **kwargs)
+            except Exception:
+                db_errors.inc(name)
+                raise
+            finally:
+                db_duration.observe(name, value=time.perf_counter() - started)
+            db_rows.inc(name, amount=_row_count(result))
+            return result
+        return timed
+
+    for name, method in inspect.getmembers(database, inspect.iscoroutinefunction):
+        if not name.startswith("_") and name not in ("open", "close", "migrate"):
+            setattr(database, name, wrap(name, method))
+
+class HandlerMetrics(BaseMiddleware):
+    """
+    Inner middleware: runs only once a handler was picked, so the
+    handler is known and filters that did not match are not timed.
+    """
+    async def __call__(self, handler, event, data):
+        callback = data["handler"].callback
+        labels = (callback.__module__.rsplit(".", 1)[-1], callback.__name__)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            handler_errors.inc(*labels)
+            raise
+        finally:
+            handler_duration.observe(*labels, value=time.perf_counter() - started)
+
+class ApiMetrics(BaseRequestMiddleware):
+    """
+    Session middleware registered after the rate limiter, so each attempt
+    is seen separately, including the ones answered with RetryAfter.
+    """
+    async def __call__(self, make_request, bot, method):
+        name = method.__api_method__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except TelegramRetryAfter:
+            api_errors.inc(name, "retry_after")
+            raise
+        except Exception as e:
+            api_errors.inc(name, type(e).__name__)
+            raise
+        finally:
+            api_duration.observe(name, value=time.perf_counter() - started)
+
+def setup_handler_metrics(dispatcher):
+    # Inner middlewares of the dispatcher apply to every included router
+    for event_name, observer in dispatcher.observers.items():
+        if event_name not in ("update", "error"):
+            observer.middleware(HandlerMetrics())
+
+class MetricsServer:
+    """
+    Serves the registry on http://host:port/metrics.
+    """
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=await registry.render(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info("Metrics on http://%s:%s/metrics", self.host, self.port)
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+
+from aiogram import BaseMiddleware
+
+from bot.cache import TTLCache
+from bot.database.core import db
+
+logger = logging.getLogger(__name__)
+
+ALREADY_JOINED_TEXT = "😎 Проверка пройдена! Ты уже числишься в списках этого розыгрыша."
+# How long a successful tap is answered from memory
+JOINED_TTL = 300
+
+class ParticipationGate(BaseMiddleware):
+    """
+    Outer middleware for participate_<id> taps that makes repeated taps free.
+
+    While a tap of a (user, giveaway) pair is being handled, further taps
+    of the same pair wait for it and get the same answer. After a tap has
+    passed, the pair is remembered and further taps are answered "already
+    participating" right away. Neither kind reaches the handler, so they
+    cost no database access and no subscription checks, only the
+    answerCallbackQuery itself.
+
+    The participate handler returns (alert text, joined) for this.
+    """
+    def __init__(self, maxsize: int = 200_000, ttl: float = JOINED_TTL):
+        self._joined = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._in_flight = {}  # (user_id, giveaway_id) -> future of the alert text
+        self.joined_hits = 0
+        self.in_flight_hits = 0
+
+    async def __call__(self, handler, event, data):
+        if not event.data or not event.data.startswith("participate_"):
+            return await handler(event, data)
+        try:
+            key = (event.from_user.id, int(event.data.split("_")[1]))
+        except ValueError:
+            return await handler(event, data)
+
+        if self._joined.get(key):
+            self.joined_hits += 1
+            await event.answer(ALREADY_JOINED_TEXT, show_alert=True)
+            return None
+
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            self.in_flight_hits += 1
+            text = await asyncio.shield(pending)
+            if text:
+                await event.answer(text, show_alert=True)
+            return None
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        text = None
+        try:
+            result = await handler(event, data)
+            if isinstance(result, tuple):
+                text, joined = result
+                if joined:
+                    self._joined.set(key, True)
+            return result
+        finally:
+            del self._in_flight[key]
+            # Waiting taps get the same answer; None if the handler failed
+            # before answering, they are then left for Telegram to time out
+            future.set_result(text)
+
+    def forget(self, user_id, giveaway_id):
+        self._joined.pop((user_id, giveaway_id))
+
+    def forget_giveaway(self, giveaway_id):
+        self._joined.pop_where(lambda key: key[1] == giveaway_id)
+
+    def stats(self) -> dict:
+        return {"joined": len(self._joined), "in_flight": len(self._in_flight),
+                "joined_hits": self.joined_hits, "in_flight_hits": self.in_flight_hits}
+
+participation_gate = ParticipationGate()
+db.add_listener("giveaway_closed", participation_gate.forget_giveaway)
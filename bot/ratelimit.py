@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Request priorities, lower goes first
+PRIORITY_USER = 0        # the user is waiting on it (tap answers, subscription checks)
+PRIORITY_DEFAULT = 1     # handler replies, admin actions
+PRIORITY_BACKGROUND = 2  # counter edits and other housekeeping
+PRIORITY_NAMES = ("user", "default", "background")
+
+METHOD_PRIORITIES = {
+    "answerCallbackQuery": PRIORITY_USER,
+    "getChatMember": PRIORITY_USER,
+}
+
+# Methods that post into a chat count towards that chat's flood limit and
+# the bot's 30 messages per second; answers and reads have their own budget
+CHAT_LIMITED_PREFIXES = ("send", "edit", "copy", "forward")
+
+# How often buckets of chats gone quiet are dropped
+CHAT_SWEEP_INTERVAL = 60
+
+_priority = ContextVar("api_priority", default=None)
+
+@contextmanager
+def background():
+    """
+    Marks every Bot API call made inside the block as background work.
+    """
+    token = _priority.set(PRIORITY_BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def wait_time(self, now: float) -> float:
+        """
+        Seconds until a token is available (0 if one is available now).
+        """
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def idle(self, now: float) -> bool:
+        # Refilled to capacity, so a fresh bucket would behave the same
+        return now >= self.blocked_until and self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+    def pause(self, seconds: float):
+        # Telegram told us to back off: nothing goes out until then
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+class ApiScheduler(BaseRequestMiddleware):
+    """
+    Session middleware every Bot API call goes through.
+
+    Enforces the per-bot message limit, a much higher per-bot budget for
+    every other method and the per-chat limit with token buckets, lets user-facing calls overtake background ones, and retries
+    calls that fail with RetryAfter once the flood wait is over.
+    """
+    def __init__(self, global_rate: float = 30, other_rate: float = 1000, chat_rate: float = 20 / 60,
+                 chat_burst: float = 10, private_rate: float = 1, private_burst: float = 3, max_retries: int = 3):
+        self.global_rate = global_rate
+        self.other_rate = other_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.private_rate = private_rate
+        self.private_burst = private_burst
+        self.max_retries = max_retries
+
+        self._global = {}  # (bot_id, sends messages) -> TokenBucket
+        self._chats = {}   # (bot_id, chat_id) -> TokenBucket
+        self._chats_swept = time.monotonic()
+        self._queues = tuple(deque() for _ in PRIORITY_NAMES)
+        self._wakeup = asyncio.Event()
+        self._pump_task = None
+
+        self.requests = 0
+        self.queued = 0
+        self.retry_after = 0
+
+    def _global_bucket(self, bot_key) -> TokenBucket:
+        bucket = self._global.get(bot_key)
+        if bucket is None:
+            rate = self.global_rate if bot_key[1] else self.other_rate
+            bucket = self._global[bot_key] = TokenBucket(rate, rate)
+        return bucket
+
+    def _chat_bucket(self, chat_key) -> TokenBucket:
+        bucket = self._chats.get(chat_key)
+        if bucket is None:
+            self._sweep_chats()
+            chat_id = chat_key[1]
+            if isinstance(chat_id, int) and chat_id > 0:
+                bucket = TokenBucket(self.private_rate, self.private_burst)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chats[chat_key] = bucket
+        return bucket
+
+    def _sweep_chats(self):
+        # One bucket per chat ever written to would otherwise stay forever
+        now = time.monotonic()
+        if now - self._chats_swept < CHAT_SWEEP_INTERVAL:
+            return
+        self._chats_swept = now
+        for chat_key in [key for key, bucket in self._chats.items() if bucket.idle(now)]:
+            del self._chats[chat_key]
+
+    @staticmethod
+    def _bot_key(bot, method):
+        return (bot.id, method.__api_method__.startswith(CHAT_LIMITED_PREFIXES))
+
+    @staticmethod
+    def _chat_key(bot, method):
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None or not method.__api_method__.startswith(CHAT_LIMITED_PREFIXES):
+            return None
+        return (bot.id, chat_id)
+
+    def _wait_time(self, bot_key, chat_key, now) -> float:
+        wait = self._global_bucket(bot_key).wait_time(now)
+        if chat_key is not None:
+            wait = max(wait, self._chat_bucket(chat_key).wait_time(now))
+        return wait
+
+    def _take(self, bot_key, chat_key):
+        self._global_bucket(bot_key).take()
+        if chat_key is not None:
+            self._chat_bucket(chat_key).take()
+
+    async def _acquire(self, bot_key, chat_key, priority):
+        # Fast path: nobody of the same or higher priority is waiting
+        if not any(self._queues[:priority + 1]) and self._wait_time(bot_key, chat_key, time.monotonic()) == 0:
+            self._take(bot_key, chat_key)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._queues[priority].append((bot_key, chat_key, future))
+        self.queued += 1
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        self._wakeup.set()
+        await future
+
+    def _grant(self) -> float:
+        """
+        Releases the first waiter that may go now, highest priority first.
+        A waiter blocked only by its own chat does not hold up the others.
+        Returns 0 if someone was released, otherwise the time to sleep.
+        """
+        now = time.monotonic()
+        next_wait = None
+        for queue in self._queues:
+            for item in list(queue):
+                bot_key, chat_key, future = item
+                if future.done(): # caller went away
+                    queue.remove(item)
+                    continue
+                wait = self._wait_time(bot_key, chat_key, now)
+                if wait == 0:
+                    queue.remove(item)
+                    self._take(bot_key, chat_key)
+                    future.set_result(None)
+                    return 0.0
+                next_wait = wait if next_wait is None else min(next_wait, wait)
+        return next_wait
+
+    async def _pump(self):
+        while any(self._queues):
+            wait = self._grant()
+            if wait is None:
+                continue
+            if wait > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def __call__(self, make_request, bot, method):
+        priority = _priority.get()
+        if priority is None:
+            priority = METHOD_PRIORITIES.get(method.__api_method__, PRIORITY_DEFAULT)
+        bot_key = self._bot_key(bot, method)
+        chat_key = self._chat_key(bot, method)
+
+        attempt = 0
+        while True:
+            await self._acquire(bot_key, chat_key, priority)
+            self.requests += 1
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.retry_after += 1
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                bucket = self._chat_bucket(chat_key) if chat_key else self._global_bucket(bot_key)
+                bucket.pause(e.retry_after)
+                logger.warning("RetryAfter %ss on %s, retry %s/%s", e.retry_after, method.__api_method__, attempt, self.max_retries)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": {name: len(queue) for name, queue in zip(PRIORITY_NAMES, self._queues)},
+            "requests": self.requests,
+            "queued": self.queued,
+            "retry_after": self.retry_after,
+        }
+
+    async def close(self):
+        if self._pump_task:
+            self._pump_task.cancel()
+            self._pump_task = None
+
+api_scheduler = ApiScheduler()
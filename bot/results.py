@@ -0,0 +1,124 @@
+import logging
+
+from aiogram import Bot
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+from bot.cache import TTLCache
+from bot.database.core import db
+from bot.tenants import current_bot_id
+
+logger = logging.getLogger(__name__)
+
+# Snapshots never change once written; entries are dropped when the
+# giveaway is finished or deleted. Values are (bot_id, texts), so one bot
+# is never served another bot's results from memory
+results_cache = TTLCache(maxsize=1000, ttl=3600)
+db.add_listener("giveaway_closed", results_cache.pop)
+
+def winner_name(winner) -> str:
+    return f"@{winner['username']}" if winner['username'] else winner['full_name']
+
+def render_results(giveaway_id, participants_count, winner_names):
+    """
+    Results text in both forms: HTML for messages, plain for callback alerts.
+    """
+    if not winner_names:
+        html_winners = alert_winners = "Победители еще не определены."
+    else:
+        html_winners = "Победители:\n" + "\n".join([f"🥇 {name}" for name in winner_names])
+        alert_winners = "Победители: " + ", ".join(winner_names)
+
+    text_html = (
+        f"📊 <b>ИТОГИ РОЗЫГРЫША #{giveaway_id}</b>\n\n"
+        f"👥 Всего участников: {participants_count}\n"
+        f"🏆 <b>{html_winners}</b>\n\n"
+        f"🔒 <i>Все победители были выбраны случайным образом (рандомайзером).</i>"
+    )
+    text_alert = (
+        f"📊 ИТОГИ РОЗЫГРЫША #{giveaway_id}\n\n"
+        f"👥 Всего участников: {participants_count}\n"
+        f"🏆 {alert_winners}\n\n"
+        f"🔒 Все победители были выбраны случайным образом (рандомайзером)."
+    )
+    return {"html": text_html, "alert": text_alert}
+
+async def save_results_snapshot(giveaway_id):
+    """
+    Freezes the results of a finished giveaway, called by announce_results.
+    """
+    participants_count = await db.get_participants_count(giveaway_id)
+    winner_names = [winner_name(w) for w in await db.get_winners(giveaway_id)]
+    texts = render_results(giveaway_id, participants_count, winner_names)
+    await db.save_results_snapshot(giveaway_id, participants_count, winner_names, texts["html"], texts["alert"])
+    results_cache.pop(giveaway_id)
+
+async def get_results(giveaway_id):
+    """
+    {"html": ..., "alert": ...} for a giveaway, or None if it doesn't exist
+    or belongs to another bot.
+    Published results come from the snapshot (cached in memory); giveaways
+    still running are rendered from live data and not cached.
+    """
+    cached = results_cache.get(giveaway_id)
+    if cached is not None and cached[0] == current_bot_id():
+        return cached[1]
+
+    snapshot = await db.get_results_snapshot(giveaway_id)
+    if snapshot:
+        texts = {"html": snapshot['text_html'], "alert": snapshot['text_alert']}
+        results_cache.set(giveaway_id, (current_bot_id(), texts))
+        return texts
+
+    giveaway = await db.get_giveaway(giveaway_id)
+    if not giveaway:
+        return None
+    winner_names = [winner_name(w) for w in await db.get_winners(giveaway_id)]
+    return render_results(giveaway_id, giveaway['participant_count'], winner_names)
+
+async def announce_results(bot: Bot, giveaway_id):
+    """
+    Finishes a giveaway whose winners are already picked: freezes the
+    results, posts them to the publish channel and swaps the participation
+    button on the post for a results link. Used by the "finish" button
+    and by the scheduler (bot/scheduler.py).
+    Returns the winners; posting errors are raised after the giveaway
+    is already finished.
+    """
+    giveaway = await db.get_giveaway(giveaway_id)
+    winners = await db.get_winners(giveaway_id)
+
+    await db.finish_giveaway(giveaway_id)
+    # From now on every results view is served from this snapshot
+    await save_results_snapshot(giveaway_id)
+
+    if not giveaway['publish_channel_id']:
+        return winners
+
+    winners_text = "\n".join([f"🥇 {w['full_name']} (@{w['username']})" for w in winners])
+    result_text = (
+        f"🎉 <b>РОЗЫГРЫШ ЗАВЕРШЕН!</b>\n\n"
+        f"🎁 Приз: {giveaway['description'].splitlines()[0]}\n\n"
+        f"🏆 <b>Победители:</b>\n"
+        f"{winners_text}\n\n"
+        f"Поздравляем! 🥳"
+    )
+    bot_info = await bot.me()
+    url = f"https://t.me/{bot_info.username}?start=res_{giveaway_id}"
+    kb_results = InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="🏆 Проверить результаты", url=url)
+    ]])
+
+    await bot.send_message(chat_id=giveaway['publish_channel_id'], text=result_text, reply_markup=kb_results)
+    logger.info("Results of giveaway #%s posted to %s", giveaway_id, giveaway['publish_channel_id'])
+
+    # Remove button from original post and replace with Results button
+    if giveaway['publish_message_id']:
+        try:
+            await bot.edit_message_reply_markup(
+                chat_id=giveaway['publish_channel_id'],
+                message_id=giveaway['publish_message_id'],
+                reply_markup=kb_results
+            )
+        except Exception as e:
+            logger.warning("Failed to replace the button on giveaway #%s: %s", giveaway_id, e)
+    return winners
@@ -0,0 +1,131 @@
+import asyncio
+import heapq
+import logging
+import time
+
+from bot.config import ADMIN_IDS
+from bot.database.core import db
+from bot.draw import draw_winners
+from bot.ratelimit import background
+from bot.results import announce_results
+from bot.tenants import bot_scope, get_bot
+from bot.utils import end_timestamp
+
+logger = logging.getLogger(__name__)
+
+class GiveawayScheduler:
+    """
+    Finishes giveaways at their end_time: draws the missing winners and
+    publishes the results.
+
+    End times of all hosted bots live in one heap that is loaded once at
+    startup and then kept in sync through database events, so the table
+    is never polled. The
+    loop sleeps until the earliest end time or until a new one is
+    scheduled. Rescheduled and cancelled giveaways leave stale heap
+    entries behind, which are skipped when they come up.
+    """
+    def __init__(self):
+        self._heap = []  # (timestamp, giveaway_id)
+        self._due = {}  # giveaway_id -> timestamp of its live heap entry
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._finishing = set()
+
+    def schedule(self, giveaway_id, end_time):
+        if not end_time:
+            self.cancel(giveaway_id)
+            return
+        timestamp = end_timestamp(end_time)
+        self._due[giveaway_id] = timestamp
+        heapq.heappush(self._heap, (timestamp, giveaway_id))
+        self._wakeup.set()
+
+    def cancel(self, giveaway_id):
+        # The heap entry is dropped when it reaches the top
+        self._due.pop(giveaway_id, None)
+
+    def stats(self) -> dict:
+        return {"scheduled": len(self._due)}
+
+    async def start(self):
+        for row in await db.get_scheduled_giveaways():
+            self.schedule(row['id'], row['end_time'])
+        logger.info("Scheduled %s giveaways", len(self._due))
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        # A giveaway being finished is not left half-announced
+        await asyncio.gather(*self._finishing, return_exceptions=True)
+
+    def _next(self):
+        # Earliest live entry, stale ones are discarded on the way
+        while self._heap:
+            timestamp, giveaway_id = self._heap[0]
+            if self._due.get(giveaway_id) == timestamp:
+                return timestamp, giveaway_id
+            heapq.heappop(self._heap)
+        return None
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            entry = self._next()
+            delay = entry[0] - time.time() if entry else None
+            if delay is None or delay > 0:
+                # A timer instead of wait_for, which can swallow a cancel
+                # that races with the event being set
+                timer = asyncio.get_running_loop().call_later(delay, self._wakeup.set) if delay is not None else None
+                try:
+                    await self._wakeup.wait()
+                finally:
+                    if timer:
+                        timer.cancel()
+                continue
+
+            heapq.heappop(self._heap)
+            del self._due[entry[1]]
+            task = asyncio.create_task(self._finish(entry[1]))
+            self._finishing.add(task)
+            task.add_done_callback(self._finishing.discard)
+
+    async def _finish(self, giveaway_id):
+        giveaway = await db.get_giveaway(giveaway_id)
+        if not giveaway or giveaway['status'] != 'active':
+            return
+        bot = get_bot(giveaway['bot_id'])
+        if not bot:
+            logger.warning("Giveaway #%s reached its end time, but its bot %s is not hosted", giveaway_id, giveaway['bot_id'])
+            return
+        logger.info("Giveaway #%s reached its end time", giveaway_id)
+
+        try:
+            with background(), bot_scope(bot.id):
+                missing = giveaway['winners_count'] - len(await db.get_winners(giveaway_id))
+                if missing > 0:
+                    await draw_winners(bot, giveaway, missing)
+                winners = await db.get_winners(giveaway_id)
+                if winners:
+                    await announce_results(bot, giveaway_id)
+                    text = f"⏰ Розыгрыш #{giveaway_id} завершен по времени.\n\n" + "\n".join(
+                        f"🥇 {w['full_name']} (@{w['username']})" for w in winners)
+                else:
+                    await db.finish_giveaway(giveaway_id)
+                    text = f"⏰ Розыгрыш #{giveaway_id} завершен по времени, но победителей нет: никто из участников не прошел проверку подписки."
+        except Exception as e:
+            logger.exception("Failed to finish giveaway #%s", giveaway_id)
+            text = f"⚠️ Не удалось завершить розыгрыш #{giveaway_id} по времени: {e}"
+
+        for admin_id in ADMIN_IDS:
+            try:
+                await bot.send_message(admin_id, text)
+            except Exception as e:
+                logger.warning("Failed to notify admin %s: %s", admin_id, e)
+
+giveaway_scheduler = GiveawayScheduler()
+db.add_listener("end_time_changed", giveaway_scheduler.schedule)
+db.add_listener("giveaway_closed", giveaway_scheduler.cancel)
@@ -6,4 +6,6 @@ class GiveawayCreation(StatesGroup):
     waiting_for_channels = State()
     waiting_for_button_text = State()
     waiting_for_publish_channel = State()
+    waiting_for_end_time = State()
+    waiting_for_winners_count = State()
     waiting_for_confirmation = State()
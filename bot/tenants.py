@@ -0,0 +1,50 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from aiogram import BaseMiddleware, Bot
+
+logger = logging.getLogger(__name__)
+
+# Bots hosted by this process, in the order they were created
+_bots = {}  # bot_id -> Bot
+_current_bot_id = ContextVar("current_bot_id", default=None)
+
+def register_bot(bot: Bot):
+    _bots[bot.id] = bot
+
+def all_bots() -> list:
+    return list(_bots.values())
+
+def default_bot_id():
+    # Owner of rows written before multi-bot hosting or outside any update
+    return next(iter(_bots), None)
+
+def get_bot(bot_id) -> Bot:
+    """
+    The bot that owns a giveaway or a channel row, None if it's no longer hosted.
+    """
+    return _bots.get(bot_id if bot_id is not None else default_bot_id())
+
+def current_bot_id():
+    return _current_bot_id.get()
+
+@contextmanager
+def bot_scope(bot_id):
+    """
+    Database reads inside the block only see this bot's rows, and rows
+    created inside it belong to this bot.
+    """
+    token = _current_bot_id.set(bot_id)
+    try:
+        yield
+    finally:
+        _current_bot_id.reset(token)
+
+class BotScope(BaseMiddleware):
+    """
+    Runs every update in the scope of the bot that received it.
+    """
+    async def __call__(self, handler, event, data):
+        with bot_scope(data["bot"].id):
+            return await handler(event, data)
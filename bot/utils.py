@@ -1,12 +1,25 @@
+import asyncio
+import heapq
+import re
+from bisect import bisect_right
+import logging
+from datetime import datetime, timedelta, timezone
+from html import escape
+from urllib.parse import quote
 from aiogram import Bot
 from aiogram.enums import ChatMemberStatus
+from bot.cache import TTLCache
+from bot.config import LOCAL_TZ
+from bot.database.core import db
+
+logger = logging.getLogger(__name__)
 
 async def prepare_channel_id(bot: Bot, channel_input: str):
     """
     Tries to resolve a channel input (username, link, or ID) to a proper chat_id or username.
     Returns: (id_or_username, chat_object) or (None, None)
     """
-    print(f"DEBUG: prepare_channel_id called for '{channel_input}'")
+    logger.debug("Resolving channel %r", channel_input)
     channel_input = channel_input.strip()
     
     # Handle links like https://t.me/username
@@ -33,13 +46,12 @@ async def prepare_channel_id(bot: Bot, channel_input: str):
     if (channel_input.startswith("-") and channel_input[1:].isdigit()) or channel_input.isdigit():
         chat_id_to_fetch = int(channel_input)
     
-    print(f"DEBUG: Resolved input to '{channel_input}', calling get_chat...")
     try:
         chat = await bot.get_chat(chat_id_to_fetch)
-        print(f"DEBUG: get_chat success: {chat.id}, {chat.title}")
+        logger.debug("Resolved channel %r to %s (%s)", channel_input, chat.id, chat.title)
         return chat.id, chat
     except Exception as e:
-        print(f"DEBUG: Could not resolve channel {channel_input}: {e}")
+        logger.info("Could not resolve channel %r: %s", channel_input, e)
         return None, None
 
 async def is_bot_admin(bot: Bot, chat_id: int) -> bool:
@@ -49,78 +61,324 @@ async def is_bot_admin(bot: Bot, chat_id: int) -> bool:
     except Exception:
         return False
 
-async def check_subscription(bot: Bot, user_id: int, channel_id: int) -> bool:
+# Membership results keyed by (user_id, channel_id). "Not subscribed" expires
+# sooner because that's the answer users fix right before tapping again.
+# Entries are replaced on chat_member updates (see handlers/admin_channels.py).
+SUBSCRIBED_TTL = 300
+NOT_SUBSCRIBED_TTL = 15
+subscription_cache = TTLCache(maxsize=100_000, ttl=SUBSCRIBED_TTL)
+
+# Behind the memory cache sits the channel_members table. chat_member
+# updates keep it current, so its rows are trusted for this long. A missed
+# update must not keep a user who has just subscribed out for a day, so
+# "not a member" rows are trusted no longer than the memory cache keeps them.
+MEMBERSHIP_MAX_AGE = "-1 day"
+NOT_MEMBER_MAX_AGE = f"-{NOT_SUBSCRIBED_TTL} seconds"
+SUBSCRIBED_STATUSES = (
+    ChatMemberStatus.CREATOR,
+    ChatMemberStatus.ADMINISTRATOR,
+    ChatMemberStatus.MEMBER,
+    ChatMemberStatus.RESTRICTED,
+)
+# Where cache misses were answered from
+membership_lookups = {"table": 0, "api": 0}
+
+def _channel_key(channel_id):
+    # Channel ids stored as text ("-100...") must share entries with ints
+    if isinstance(channel_id, str) and channel_id.lstrip("-").isdigit():
+        return int(channel_id)
+    return channel_id
+
+def _cache_membership(user_id: int, channel_id, status) -> bool:
+    is_sub = status in SUBSCRIBED_STATUSES
+    subscription_cache.set((user_id, channel_id), is_sub, ttl=SUBSCRIBED_TTL if is_sub else NOT_SUBSCRIBED_TTL)
+    return is_sub
+
+def remember_membership(user_id: int, channel_id: int, status):
+    """
+    Records a membership status seen in a chat_member update or an API answer.
+    """
+    _cache_membership(user_id, channel_id, status)
+    if isinstance(channel_id, int):
+        db.set_channel_member(channel_id, user_id, status)
+
+async def _load_memberships(user_id: int, channel_ids) -> set:
+    """
+    Fills the memory cache from fresh channel_members rows in one query.
+    Returns the channels that were found.
+    """
+    channel_ids = [ch for ch in channel_ids if isinstance(ch, int)]
+    if not channel_ids:
+        return set()
+    statuses = await db.get_memberships(user_id, channel_ids, MEMBERSHIP_MAX_AGE, SUBSCRIBED_STATUSES, NOT_MEMBER_MAX_AGE)
+    for channel_id, status in statuses.items():
+        _cache_membership(user_id, channel_id, status)
+    membership_lookups["table"] += len(statuses)
+    return set(statuses)
+
+async def check_subscription(bot: Bot, user_id: int, channel_id: int, raise_errors: bool = False) -> bool:
+    """
+    Whether the user is a member of the channel. API errors count as
+    "not subscribed" unless raise_errors is set.
+    """
+    channel_id = _channel_key(channel_id)
+
+    cached = subscription_cache.get((user_id, channel_id))
+    if cached is not None:
+        return cached
+    if await _load_memberships(user_id, [channel_id]):
+        return subscription_cache.get((user_id, channel_id))
+    return await _fetch_subscription(bot, user_id, channel_id, raise_errors)
+
+async def _fetch_subscription(bot: Bot, user_id: int, channel_id, raise_errors: bool = False) -> bool:
+    membership_lookups["api"] += 1
     try:
-        print(f"DEBUG: Checking {user_id} in {channel_id}")
         member = await bot.get_chat_member(chat_id=channel_id, user_id=user_id)
-        print(f"DEBUG: Status for {user_id} in {channel_id} is {member.status}")
-        
-        return member.status in [
-            ChatMemberStatus.CREATOR,
-            ChatMemberStatus.ADMINISTRATOR,
-            ChatMemberStatus.MEMBER,
-            ChatMemberStatus.RESTRICTED 
-        ]
+        logger.debug("Membership checked", extra={"user_id": user_id, "channel_id": channel_id,
+                                                  "status": member.status, "sampled": True})
     except Exception as e:
-        print(f"ERROR checking subscription for {channel_id}: {e}")
+        # Errors are not cached, the next tap asks Telegram again
+        logger.warning("Subscription check failed for %s in %s: %s", user_id, channel_id, e)
+        if raise_errors:
+            raise
         return False
 
-from aiogram.utils.text_decorations import html_decoration
+    remember_membership(user_id, channel_id, member.status)
+    return member.status in SUBSCRIBED_STATUSES
 
-def get_message_html(message) -> str:
+# Limits for verifying several channels at once: at most this many
+# get_chat_member calls in flight process-wide, and no single check may
+# take longer than the timeout (including the wait for a slot), so the
+# callback is still answered in time when Telegram is slow.
+SUBSCRIPTION_CHECK_CONCURRENCY = 20
+SUBSCRIPTION_CHECK_TIMEOUT = 3.0
+_subscription_semaphore = asyncio.Semaphore(SUBSCRIPTION_CHECK_CONCURRENCY)
+
+async def _bounded_check(bot: Bot, user_id: int, channel_id):
+    # The memory cache may have been filled while waiting for a slot
+    cached = subscription_cache.get((user_id, channel_id))
+    if cached is not None:
+        return cached
+    async with _subscription_semaphore:
+        return await _fetch_subscription(bot, user_id, channel_id)
+
+async def check_subscriptions(bot: Bot, user_id: int, channel_ids):
     """
-    Extracts HTML formatted text from a message manually.
+    Checks all channels concurrently.
+    Returns: (not_subscribed, unverified) lists of channel ids, where
+    unverified are the ones that timed out.
     """
-    if not message.text and not message.caption:
-        return ""
+    channel_ids = list(channel_ids)
+    keys = [_channel_key(ch) for ch in channel_ids]
+    results = [subscription_cache.get((user_id, ch)) for ch in keys]
+
+    # One query for every channel the memory cache doesn't know, so only
+    # pairs never seen before (or not seen for a day) go to the API
+    missing = [ch for ch, result in zip(keys, results) if result is None]
+    if missing and await _load_memberships(user_id, missing):
+        results = [subscription_cache.get((user_id, ch)) if result is None else result
+                   for ch, result in zip(keys, results)]
+
+    fetched = iter(await asyncio.gather(*(
+        asyncio.wait_for(_bounded_check(bot, user_id, ch), SUBSCRIPTION_CHECK_TIMEOUT)
+        for ch, result in zip(keys, results) if result is None
+    ), return_exceptions=True))
+    results = [next(fetched) if result is None else result for result in results]
+
+    not_subscribed = []
+    unverified = []
+    for ch, result in zip(channel_ids, results):
+        if isinstance(result, asyncio.TimeoutError):
+            unverified.append(ch)
+        elif result is not True:
+            not_subscribed.append(ch)
+    return not_subscribed, unverified
+
+def build_share_url(chat_id: int, username, message_id: int) -> str:
+    """
+    t.me share link for a channel post. Private channels get the t.me/c/
+    form, which needs no invite link.
+    """
+    if username:
+        post_url = f"https://t.me/{username}/{message_id}"
+    else:
+        post_url = f"https://t.me/c/{str(chat_id).removeprefix('-100')}/{message_id}"
+    return f"https://t.me/share/url?url={quote(post_url, safe='')}&text={quote('Участвуй в конкурсе! 🎁')}"
+
+# Stored like CURRENT_TIMESTAMP: UTC, "YYYY-MM-DD HH:MM:SS"
+DB_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+END_TIME_FORMATS = ("%d.%m.%Y %H:%M", "%d.%m.%y %H:%M", "%d.%m %H:%M")
+RELATIVE_UNITS = {"d": 86400, "д": 86400, "h": 3600, "ч": 3600, "m": 60, "м": 60}
+# Upper bound for the winners a scheduled draw picks
+MAX_WINNERS = 100
+
+def parse_end_time(text: str, now: datetime = None):
+    """
+    End time typed by an admin, as a DB timestamp string, or None if it
+    can't be parsed or isn't in the future. Accepts "25.12.2026 18:00",
+    "25.12 18:00" (local TIMEZONE) or a duration like "3d", "12h", "1d 6h".
+    """
+    now = now or datetime.now(timezone.utc)
+    text = text.strip().lower()
 
+    end = None
+    parts = text.split()
+    if parts and all(len(p) > 1 and p[:-1].isdigit() and p[-1] in RELATIVE_UNITS for p in parts):
+        end = now + timedelta(seconds=sum(int(p[:-1]) * RELATIVE_UNITS[p[-1]] for p in parts))
+    else:
+        local_now = now.astimezone(LOCAL_TZ)
+        for fmt in END_TIME_FORMATS:
+            try:
+                parsed = datetime.strptime(text, fmt)
+            except ValueError:
+                continue
+            if "%Y" not in fmt and "%y" not in fmt:
+                parsed = parsed.replace(year=local_now.year)
+                if parsed.replace(tzinfo=local_now.tzinfo) < local_now:
+                    parsed = parsed.replace(year=local_now.year + 1)
+            end = parsed.replace(tzinfo=LOCAL_TZ)
+            break
+
+    if end is None or end <= now:
+        return None
+    return end.astimezone(timezone.utc).strftime(DB_TIME_FORMAT)
+
+def end_timestamp(end_time: str) -> float:
+    return datetime.strptime(end_time, DB_TIME_FORMAT).replace(tzinfo=timezone.utc).timestamp()
+
+def format_end_time(end_time: str) -> str:
+    """
+    DB end time as shown to admins, in the local TIMEZONE.
+    """
+    local = datetime.fromtimestamp(end_timestamp(end_time), LOCAL_TZ)
+    return local.strftime("%d.%m.%Y %H:%M")
+
+async def resolve_share_url(bot: Bot, giveaway):
+    """
+    Stored share URL of a published giveaway. Giveaways published before
+    it was stored get it computed (from the channel directory, or one
+    get_chat) and saved on first use.
+    """
+    if giveaway['share_url']:
+        return giveaway['share_url']
+
+    channel = await db.find_channel(giveaway['publish_channel_id'])
+    if channel:
+        username = channel['username']
+    else:
+        try:
+            username = (await bot.get_chat(giveaway['publish_channel_id'])).username
+        except Exception as e:
+            logger.warning("Failed to resolve share url for giveaway #%s: %s", giveaway['id'], e)
+            return None
+    share_url = build_share_url(giveaway['publish_channel_id'], username, giveaway['publish_message_id'])
+    await db.set_share_url(giveaway['id'], share_url)
+    return share_url
+
+# Entity type -> (opening tag, closing tag). Types not listed (mention,
+# hashtag, email...) are plain text for Telegram's HTML parser too.
+ENTITY_TAGS = {
+    "bold": ("<b>", "</b>"),
+    "italic": ("<i>", "</i>"),
+    "underline": ("<u>", "</u>"),
+    "strikethrough": ("<s>", "</s>"),
+    "spoiler": ("<tg-spoiler>", "</tg-spoiler>"),
+    "code": ("<code>", "</code>"),
+    "blockquote": ("<blockquote>", "</blockquote>"),
+    "expandable_blockquote": ("<blockquote expandable>", "</blockquote>"),
+}
+
+# Characters that move entity offsets: escaped ones and astral ones
+SHIFT_RE = re.compile("[&<>\U00010000-\U0010FFFF]")
+ESCAPE_SHIFTS = {"&": 4, "<": 3, ">": 3}
+
+def _entity_tags(entity, escaped: str, start: int, end: int):
+    tags = ENTITY_TAGS.get(entity.type)
+    if tags:
+        return tags
+    if entity.type == "pre":
+        if entity.language:
+            return f'<pre><code class="language-{escape(entity.language)}">', "</code></pre>"
+        return "<pre>", "</pre>"
+    if entity.type == "text_link":
+        return f'<a href="{escape(entity.url)}">', "</a>"
+    if entity.type == "url":
+        # The link text is already escaped, only quotes are left
+        href = escaped[start:end].replace('"', "&quot;").replace("'", "&#x27;")
+        return f'<a href="{href}">', "</a>"
+    if entity.type == "text_mention" and entity.user:
+        return f'<a href="tg://user?id={entity.user.id}">', "</a>"
+    if entity.type == "custom_emoji":
+        return f'<tg-emoji emoji-id="{escape(entity.custom_emoji_id)}">', "</tg-emoji>"
+    return None
+
+def get_message_html(message) -> str:
+    """
+    HTML of a message's text or caption, nested entities included.
+    """
     text = message.text or message.caption
+    if not text:
+        return ""
     entities = message.entities or message.caption_entities
-
     if not entities:
+        # Typed HTML is kept as is, the post prompt allows it
         return text
 
-    # Sort entities by offset
-    entities = sorted(entities, key=lambda e: e.offset)
-    
-    formatted_text = ""
-    last_offset = 0
-    
-    # Simple manual reconstruction
-    # Note: Nested entities are not handled here, but Telegram usually sends non-nested for basic formatting.
-    # Aiogram 3's `message.html_text` is NOT standard, so we do this.
-    
-    for entity in entities:
-        start = entity.offset
-        end = start + entity.length
-        
-        # Text before entity
-        chunk = text[last_offset:start]
-        formatted_text += html_decoration.quote(chunk)
-        
-        # Entity text
-        entity_text = text[start:end]
-        
-        if entity.type == "text_link":
-            formatted_text += f'<a href="{entity.url}">{html_decoration.quote(entity_text)}</a>'
-        elif entity.type == "url":
-            formatted_text += f'<a href="{entity_text}">{html_decoration.quote(entity_text)}</a>'
-        elif entity.type == "bold":
-            formatted_text += f'<b>{html_decoration.quote(entity_text)}</b>'
-        elif entity.type == "italic":
-            formatted_text += f'<i>{html_decoration.quote(entity_text)}</i>'
-        elif entity.type == "code":
-            formatted_text += f'<code>{html_decoration.quote(entity_text)}</code>'
-        elif entity.type == "pre":
-            formatted_text += f'<pre>{html_decoration.quote(entity_text)}</pre>'
-        elif entity.type == "strikethrough":
-            formatted_text += f'<s>{html_decoration.quote(entity_text)}</s>'
-        elif entity.type == "underline":
-            formatted_text += f'<u>{html_decoration.quote(entity_text)}</u>'
+    # The text is escaped once and cut at the entity boundaries. Offsets
+    # count UTF-16 code units: past an astral character (two units) the
+    # offsets run one ahead of the string, past an escaped one the escaped
+    # text runs a few characters ahead of the offsets. Shifts are summed
+    # per break point, so mapping an offset costs one bisect.
+    escaped = escape(text, False)
+    size = len(escaped)
+    points, shifts = [], [0]
+    astral = 0
+    for match in SHIFT_RE.finditer(text):
+        char = match.group()
+        points.append(match.start() + astral + 1)
+        if char in ESCAPE_SHIFTS:
+            shifts.append(shifts[-1] + ESCAPE_SHIFTS[char])
         else:
-            formatted_text += html_decoration.quote(entity_text)
-            
-        last_offset = end
-        
-    formatted_text += html_decoration.quote(text[last_offset:])
-    return formatted_text
+            astral += 1
+            shifts.append(shifts[-1] - 1)
+
+    def index_of(offset):
+        return min(offset + shifts[bisect_right(points, offset)], size)
+
+    # Heap of (start, -end, index, opening tag, closing tag): outer first on ties
+    spans = []
+    for index, entity in enumerate(entities):
+        start, end = index_of(entity.offset), index_of(entity.offset + entity.length)
+        if end > start:
+            tags = _entity_tags(entity, escaped, start, end)
+            if tags:
+                spans.append((start, -end, index, *tags))
+    heapq.heapify(spans)
+
+    parts = []
+    append = parts.append
+    stack = []  # (end, closing tag) of open spans, innermost last
+    position = 0
+    while spans:
+        start, end, index, opening, closing = heapq.heappop(spans)
+        end = -end
+        while stack and stack[-1][0] <= start:
+            close_at, tag = stack.pop()
+            append(escaped[position:close_at])
+            append(tag)
+            position = close_at
+        if stack and stack[-1][0] < end:
+            # Overlaps the enclosing span: cut here, the rest reopens after it
+            heapq.heappush(spans, (stack[-1][0], -end, index, opening, closing))
+            end = stack[-1][0]
+        append(escaped[position:start])
+        append(opening)
+        position = start
+        stack.append((end, closing))
+
+    for close_at, tag in reversed(stack):
+        append(escaped[position:close_at])
+        append(tag)
+        position = close_at
+    append(escaped[position:])
+    return "".join(parts)
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import time
+
+from aiogram import Bot
+
+from bot.database.core import db
+from bot.database.giveaways import parse_channel_ids
+from bot.participation import participation_gate
+from bot.ratelimit import background
+from bot.tenants import bot_scope, get_bot
+from bot.utils import check_subscription
+
+logger = logging.getLogger(__name__)
+
+VERIFY_BATCH = 200
+VERIFY_CONCURRENCY = 10
+PROGRESS_INTERVAL = 10.0
+
+def progress_text(job, done=False) -> str:
+    checked, eligible, failed = job['checked'], job['eligible'], job['failed']
+    head = "✅ Проверка подписок завершена" if done else "🔎 Проверка подписок"
+    total = max(job['total'], checked)
+    return (
+        f"{head}, розыгрыш #{job['giveaway_id']}\n\n"
+        f"Проверено: {checked} из {total} ({100 * checked // max(total, 1)}%)\n"
+        f"✅ Подписаны: {eligible}\n"
+        f"🚫 Отписались: {checked - eligible - failed}\n"
+        f"⚠️ Не удалось проверить: {failed}"
+    )
+
+class VerificationJobs:
+    """
+    Re-checks the subscriptions of every participant of a giveaway in the
+    background and stores the verdict on the participant row.
+
+    Progress (a keyset cursor and the counters) is saved with every batch,
+    so a job interrupted by a restart continues where it stopped. Checks
+    run at background priority and at most `concurrency` at a time, so the
+    job never competes with users tapping buttons.
+    """
+    def __init__(self, concurrency: int = VERIFY_CONCURRENCY):
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks = {}  # giveaway_id -> task
+
+    def is_running(self, giveaway_id) -> bool:
+        task = self._tasks.get(giveaway_id)
+        return task is not None and not task.done()
+
+    async def start(self, bot: Bot, giveaway_id, chat_id, message_id):
+        if await db.start_verification_job(giveaway_id, chat_id, message_id):
+            self._spawn(bot, giveaway_id)
+
+    async def resume(self):
+        """
+        Restarts the jobs that were running when the bot stopped.
+        """
+        for job in await db.get_running_verification_jobs():
+            giveaway = await db.get_giveaway(job['giveaway_id'])
+            bot = get_bot(giveaway['bot_id']) if giveaway else None
+            if not bot:
+                await db.finish_verification_job(job['giveaway_id'], "cancelled")
+                continue
+            # The job task inherits the scope of the bot that owns the giveaway
+            with bot_scope(bot.id):
+                self._spawn(bot, job['giveaway_id'])
+
+    def cancel(self, giveaway_id):
+        task = self._tasks.pop(giveaway_id, None)
+        if task:
+            task.cancel()
+
+    async def stop(self):
+        # Progress is already saved, running jobs resume on the next start
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _spawn(self, bot: Bot, giveaway_id):
+        if self.is_running(giveaway_id):
+            return
+        task = asyncio.create_task(self._run(bot, giveaway_id))
+        self._tasks[giveaway_id] = task
+
+        def forget(done_task):
+            if self._tasks.get(giveaway_id) is done_task:
+                del self._tasks[giveaway_id]
+        task.add_done_callback(forget)
+
+    async def _check(self, bot: Bot, user_id, channels):
+        """
+        True/False, or None if Telegram could not be asked.
+        """
+        async with self._semaphore:
+            try:
+                for channel_id in channels:
+                    if not await check_subscription(bot, user_id, channel_id, raise_errors=True):
+                        return False
+                return True
+            except Exception:
+                return None
+
+    async def _run(self, bot: Bot, giveaway_id):
+        job = await db.get_verification_job(giveaway_id)
+        giveaway = await db.get_giveaway(giveaway_id)
+        if not job or not giveaway or giveaway['status'] != 'active':
+            if job:
+                await db.finish_verification_job(giveaway_id, "cancelled")
+            return
+
+        channels = parse_channel_ids(giveaway['channel_ids'])
+        after = (job['cursor_joined_at'], job['cursor_user_id']) if job['cursor_user_id'] is not None else None
+        state = dict(job)
+        last_progress = time.monotonic()
+
+        async def progress(done=False):
+            try:
+                await bot.edit_message_text(progress_text(state, done), chat_id=job['chat_id'], message_id=job['message_id'])
+            except Exception as e:
+                logger.debug("Verification progress edit failed: %s", e)
+
+        logger.info("Verifying participants of giveaway #%s from %s", giveaway_id, after or "the start")
+        with background():
+            try:
+                async for rows in db.iter_participants(giveaway_id, VERIFY_BATCH, after=after):
+                    user_ids = [row[0] for row in rows]
+                    results = await asyncio.gather(*(self._check(bot, user_id, channels) for user_id in user_ids))
+                    verdicts = [(user_id, ok) for user_id, ok in zip(user_ids, results) if ok is not None]
+
+                    # Their next tap is checked again instead of answered from memory
+                    for user_id, ok in verdicts:
+                        if not ok:
+                            participation_gate.forget(user_id, giveaway_id)
+
+                    state['checked'] += len(rows)
+                    state['eligible'] += sum(1 for _, ok in verdicts if ok)
+                    state['failed'] += len(rows) - len(verdicts)
+                    await db.save_verification_batch(giveaway_id, verdicts, (rows[-1][3], rows[-1][0]),
+                                                     state['checked'], state['eligible'], state['failed'])
+
+                    if time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                        last_progress = time.monotonic()
+                        state['total'] = await db.get_participants_count(giveaway_id)
+                        await progress()
+
+                await db.finish_verification_job(giveaway_id)
+                state['total'] = state['checked']
+                await progress(done=True)
+                logger.info("Verified %s participants of giveaway #%s: %s eligible, %s failed",
+                            state['checked'], giveaway_id, state['eligible'], state['failed'])
+            except Exception:
+                logger.exception("Verification of giveaway #%s failed, it resumes on restart", giveaway_id)
+
+verification_jobs = VerificationJobs()
+db.add_listener("giveaway_closed", verification_jobs.cancel)